@@ -0,0 +1,61 @@
+# coding=utf-8
+"""
+Tushare 工具参数校验测试
+
+已安装 fastjsonschema 时走编译后的 schema 校验，否则走手写规则；两条路径对同一参数的结论应一致。
+"""
+
+import os
+import unittest
+from unittest import mock
+
+# 避免导入 litellm 时联网拉取模型价格表
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+from trendradar.ai import tools  # noqa: E402
+
+try:
+    import fastjsonschema  # noqa: F401
+    HAS_FASTJSONSCHEMA = True
+except ImportError:
+    HAS_FASTJSONSCHEMA = False
+
+
+class ValidateArgsTest(unittest.TestCase):
+    """同一组参数分别在 schema 校验与手写校验下验证"""
+
+    CASES = [
+        # (工具名, 参数, 是否合法)
+        ("get_limit_list", {"trade_date": "20260214", "limit_type": ""}, True),
+        ("get_limit_list", {"trade_date": "20260214", "limit_type": None}, True),
+        ("get_limit_list", {"trade_date": "20260214", "limit_type": "U"}, True),
+        ("get_limit_list", {"trade_date": "20260214", "limit_type": "X"}, False),
+        ("get_index_daily", {"ts_code": "000001.SH", "trade_date": ""}, True),
+        ("get_index_daily", {"ts_code": "899050.BJ"}, True),
+        ("get_index_daily", {"ts_code": "000001.SH", "foo": "bar"}, False),
+        ("get_index_daily", {"ts_code": 1}, False),
+        ("get_index_daily", {"ts_code": ""}, False),
+        ("get_stock_daily", {"ts_code": "bad"}, False),
+    ]
+
+    def _check(self):
+        for name, args, valid in self.CASES:
+            with self.subTest(tool=name, args=args):
+                error = tools._validate_args(name, args)
+                if valid:
+                    self.assertIsNone(error)
+                else:
+                    self.assertIsNotNone(error)
+
+    @unittest.skipUnless(HAS_FASTJSONSCHEMA, "fastjsonschema 未安装")
+    def test_schema_validator(self):
+        self.assertIsNotNone(tools._schema_validators())
+        self._check()
+
+    def test_fallback_rules(self):
+        with mock.patch.object(tools, "_schema_validators", return_value=None):
+            self._check()
+
+
+if __name__ == "__main__":
+    unittest.main()
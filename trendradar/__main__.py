@@ -476,6 +476,7 @@ class NewsAnalyzer:
                 print(f"[AI] 调度器: 时间段 {schedule.period_name or schedule.period_key} 今天首次分析")
 
         print("[AI] 正在进行 AI 分析...")
+        analyzer = None
         try:
             ai_config = self.ctx.config.get("AI", {})
             debug_mode = self.ctx.config.get("DEBUG", False)
@@ -573,6 +574,9 @@ class NewsAnalyzer:
             print(f"[AI] 详细错误堆栈:", file=sys.stderr)
             traceback.print_exc(file=sys.stderr)
             return AIAnalysisResult(success=False, error=f"{error_type}: {error_msg}")
+        finally:
+            if analyzer is not None:
+                analyzer.close()
 
     def _load_analysis_data(
         self,
@@ -929,18 +933,21 @@ class NewsAnalyzer:
 
             # 使用 NotificationDispatcher 发送到所有渠道
             dispatcher = self.ctx.create_notification_dispatcher()
-            results = dispatcher.dispatch_all(
-                report_data=report_data,
-                report_type=report_type,
-                update_info=update_info_to_send,
-                proxy_url=self.proxy_url,
-                mode=mode,
-                html_file_path=html_file_path,
-                rss_items=rss_items,
-                rss_new_items=rss_new_items,
-                ai_analysis=ai_result,
-                standalone_data=standalone_data,
-            )
+            try:
+                results = dispatcher.dispatch_all(
+                    report_data=report_data,
+                    report_type=report_type,
+                    update_info=update_info_to_send,
+                    proxy_url=self.proxy_url,
+                    mode=mode,
+                    html_file_path=html_file_path,
+                    rss_items=rss_items,
+                    rss_new_items=rss_new_items,
+                    ai_analysis=ai_result,
+                    standalone_data=standalone_data,
+                )
+            finally:
+                dispatcher.close()
 
             if not results:
                 print("未配置任何通知渠道，跳过通知发送")
@@ -7,7 +7,7 @@ TrendRadar AI 模块
 
 from .analyzer import AIAnalyzer, AIAnalysisResult
 from .translator import AITranslator, TranslationResult, BatchTranslationResult
-from .tools import TushareToolExecutor, TUSHARE_TOOLS_SCHEMA
+from .tools import TushareToolExecutor, dump_schema, get_tools_schema
 from .formatter import (
     get_ai_analysis_renderer,
     render_ai_analysis_markdown,
@@ -18,6 +18,16 @@ from .formatter import (
     render_ai_analysis_plain,
 )
 
+
+def __getattr__(name):
+    # TUSHARE_TOOLS_SCHEMA / TUSHARE_TOOLS_SCHEMA_JSON 延迟加载，避免导入时解析 schema
+    if name == "TUSHARE_TOOLS_SCHEMA":
+        return get_tools_schema()
+    if name == "TUSHARE_TOOLS_SCHEMA_JSON":
+        return dump_schema()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 __all__ = [
     # 分析器
     "AIAnalyzer",
@@ -29,6 +39,9 @@ __all__ = [
     # 工具
     "TushareToolExecutor",
     "TUSHARE_TOOLS_SCHEMA",
+    "TUSHARE_TOOLS_SCHEMA_JSON",
+    "dump_schema",
+    "get_tools_schema",
     # 格式化
     "get_ai_analysis_renderer",
     "render_ai_analysis_markdown",
@@ -14,7 +14,7 @@ from pathlib import Path
 from typing import Any, Callable, Dict, List, Optional
 
 from trendradar.ai.client import AIClient
-from trendradar.ai.tools import TUSHARE_TOOLS_SCHEMA, TushareToolExecutor
+from trendradar.ai.tools import TushareToolExecutor, get_tools_schema
 
 
 @dataclass
@@ -68,7 +68,7 @@ class AIAnalyzer:
         self.debug = debug
 
         # 创建 AI 客户端（基于 LiteLLM）
-        self.client = AIClient(ai_config)
+        self.client = AIClient(ai_config, debug=debug)
 
         # 验证配置
         valid, error = self.client.validate_config()
@@ -93,13 +93,24 @@ class AIAnalyzer:
             tushare_config = tushare_config or {}
             tushare_token = tushare_config.get("TOKEN", "") or os.environ.get("TUSHARE_TOKEN", "")
             if tushare_token:
-                self.tool_executor = TushareToolExecutor(tushare_token)
+                self.tool_executor = TushareToolExecutor(
+                    tushare_token,
+                    cache_dir=tushare_config.get("DATA_CACHE_DIR", ""),
+                    rate_limit=tushare_config.get("RATE_LIMIT", 120),
+                    response_format=tushare_config.get("RESPONSE_FORMAT", "text"),
+                )
                 valid_ts, error_ts = self.tool_executor.validate()
                 if not valid_ts:
                     print(f"[AI] Tushare 工具警告: {error_ts}")
                     self.tool_executor = None
                 else:
-                    print(f"[AI] 工具: Tushare 已启用 ({len(TUSHARE_TOOLS_SCHEMA)} tools)")
+                    print(f"[AI] 工具: Tushare 已启用 ({len(get_tools_schema())} tools)")
+                    # 预取本身会初始化客户端并建立连接，未配置预取时单独预热
+                    prefetch_indexes = tushare_config.get("PREFETCH_INDEXES") or []
+                    if prefetch_indexes:
+                        self.tool_executor.prefetch(list(prefetch_indexes))
+                    else:
+                        self.tool_executor.warmup()
             else:
                 print("[AI] 工具: 已启用但未配置 Tushare Token，工具不可用")
         else:
@@ -261,6 +272,15 @@ class AIAnalyzer:
         try:
             response = self._call_ai(user_prompt)
 
+            usage = self.client.stats()
+            print(f"[AI] 用量: {usage['requests']} 次请求, {usage['total_tokens']} tokens"
+                  f"（prompt {usage['prompt_tokens']} / completion {usage['completion_tokens']}）"
+                  f", 估算费用 ${usage['cost_usd']}")
+            if self.tool_executor:
+                ts_stats = self.tool_executor.cache_stats()
+                print(f"[AI] Tushare 缓存: 命中 {ts_stats['hits']} / 未命中 {ts_stats['misses']}"
+                      f"（命中率 {ts_stats['hit_rate']:.0%}）")
+
             print("\n" + "=" * 80)
             print("[AI 调试] AI 原始响应内容")
             print("=" * 80)
@@ -424,13 +444,18 @@ class AIAnalyzer:
         if self.tool_executor is not None:
             return self.client.chat_with_tools(
                 messages=messages,
-                tools=TUSHARE_TOOLS_SCHEMA,
+                tools=get_tools_schema(self.tool_executor.response_format),
                 tool_executor=self.tool_executor.execute,
                 max_rounds=self.tools_max_rounds,
+                tool_batch_executor=self.tool_executor.execute_many,
             )
 
         return self.client.chat(messages)
 
+    def close(self) -> None:
+        """释放 AI 客户端持有的连接池等资源"""
+        self.client.close()
+
     def _format_time_range(self, first_time: str, last_time: str) -> str:
         """格式化时间范围（简化显示，只保留时分）"""
         def extract_time(time_str: str) -> str:
@@ -0,0 +1,183 @@
+# coding=utf-8
+"""
+AI 响应缓存模块
+
+为 AIClient 提供进程内的响应缓存（精确匹配 + 可选语义相似匹配），
+避免同一运行中重复请求相同或近似的提示词
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 不影响模型输出的请求参数，不参与缓存键计算
+_NON_SEMANTIC_PARAMS = ("api_key", "api_base", "timeout", "num_retries")
+
+
+def make_cache_key(params: Dict[str, Any]) -> str:
+    """
+    根据请求参数计算缓存键（SHA-256）
+
+    Args:
+        params: LiteLLM completion 请求参数
+
+    Returns:
+        str: 十六进制缓存键
+    """
+    canonical = {k: v for k, v in params.items() if k not in _NON_SEMANTIC_PARAMS}
+    if orjson is not None:
+        payload = orjson.dumps(canonical, option=orjson.OPT_SORT_KEYS, default=str)
+    else:
+        payload = json.dumps(canonical, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class ResponseCache:
+    """线程安全的 LRU 响应缓存，支持可选的过期时间"""
+
+    def __init__(self, max_size: int = 256, ttl: Optional[float] = None):
+        """
+        初始化响应缓存
+
+        Args:
+            max_size: 最大缓存条目数，超出后淘汰最久未使用的条目
+            ttl: 条目过期时间（秒），None 或 0 表示不过期
+        """
+        self.max_size = max(1, max_size)
+        self.ttl = ttl or None
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，未命中或已过期返回 None"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        """写入缓存"""
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SemanticCache:
+    """
+    语义缓存：对提示词做向量化，相似度超过阈值时复用已有响应
+
+    依赖 faiss-cpu 与 sentence-transformers（可选依赖），未安装时自动禁用。
+    """
+
+    def __init__(
+        self,
+        model_name: str = "mixedbread-ai/mxbai-embed-large-v1",
+        threshold: float = 0.92,
+    ):
+        """
+        初始化语义缓存
+
+        Args:
+            model_name: sentence-transformers 向量模型名称
+            threshold: 余弦相似度阈值，达到该值视为命中
+        """
+        self.model_name = model_name
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._encoder = None
+        self._index = None
+        self._responses: List[str] = []
+        self._disabled = False
+        self._lock = threading.Lock()
+
+    def _ensure_ready(self) -> bool:
+        """延迟加载向量模型与索引（避免未安装依赖时报错）"""
+        if self._encoder is not None:
+            return True
+        if self._disabled:
+            return False
+        try:
+            import faiss
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            print("[AI] 语义缓存需要安装 faiss-cpu 和 sentence-transformers，已禁用")
+            self._disabled = True
+            return False
+
+        encoder = SentenceTransformer(self.model_name)
+        self._index = faiss.IndexFlatIP(encoder.get_sentence_embedding_dimension())
+        self._encoder = encoder
+        return True
+
+    def embed(self, messages: List[Dict[str, Any]]) -> Any:
+        """
+        将 system/user 消息内容向量化（L2 归一化，内积即余弦相似度）
+
+        Returns:
+            形状为 (1, dim) 的 float32 向量；依赖不可用时返回 None
+        """
+        if not self._ensure_ready():
+            return None
+        text = "\n".join(
+            str(m.get("content") or "")
+            for m in messages
+            if isinstance(m, dict) and m.get("role") in ("system", "user")
+        )
+        return self._encoder.encode([text], normalize_embeddings=True).astype("float32")
+
+    def get(self, vector: Any) -> Optional[str]:
+        """按向量查找最相似的已缓存响应，未达阈值返回 None"""
+        if vector is None:
+            return None
+        with self._lock:
+            if self._index.ntotal > 0:
+                scores, ids = self._index.search(vector, 1)
+                if scores[0][0] >= self.threshold:
+                    self.hits += 1
+                    return self._responses[ids[0][0]]
+            self.misses += 1
+            return None
+
+    def set(self, vector: Any, value: str) -> None:
+        """写入向量与对应响应"""
+        if vector is None:
+            return
+        with self._lock:
+            self._index.add(vector)
+            self._responses.append(value)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计，便于调整阈值"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._responses),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
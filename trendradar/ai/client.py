@@ -6,22 +6,123 @@ AI 客户端模块
 支持 100+ AI 提供商（OpenAI、DeepSeek、Gemini、Claude、国内模型等）
 """
 
+import asyncio
+import functools
 import json
 import os
-from typing import Any, Callable, Dict, List, Optional
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
 
+import httpx
 import litellm
-from litellm import completion
+from litellm import acompletion, completion
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+from trendradar.ai.cache import ResponseCache, SemanticCache, make_cache_key
+
+
+_http_pool_lock = threading.Lock()
+# 本模块安装到 litellm.client_session 的共享连接池及其引用计数（每个持有者 AIClient 计一次）
+_http_pool: Optional[httpx.Client] = None
+_http_pool_refs = 0
+
+
+@functools.lru_cache(maxsize=32)
+def _supports_function_calling(model: str) -> Optional[bool]:
+    """
+    查询模型是否支持 Function Calling（按模型名缓存，跨实例复用）
+
+    Returns:
+        Optional[bool]: 支持/不支持；LiteLLM 无法识别该模型时返回 None
+    """
+    try:
+        return bool(litellm.supports_function_calling(model=model))
+    except Exception:
+        return None
+
+
+def _acquire_http_pool(timeout: float) -> bool:
+    """
+    引用进程共享的 HTTP 连接池（Keep-Alive 复用 TCP/TLS 连接），首个引用者负责创建
+
+    连接池安装在 litellm.client_session 上，由所有 AIClient 共享，按引用计数释放；
+    调用方自行配置了 client_session 时不做改动。异步请求不共享连接池：
+    httpx.AsyncClient 绑定创建时的事件循环，而 chat_batch 每次都会新建循环。
+
+    Returns:
+        bool: 是否持有一个引用（持有者需在 close() 时调用 _release_http_pool）
+    """
+    global _http_pool, _http_pool_refs
+    with _http_pool_lock:
+        if litellm.client_session is not None and litellm.client_session is not _http_pool:
+            return False
+        if _http_pool is None:
+            try:
+                import h2  # noqa: F401
+                http2 = True
+            except ImportError:
+                http2 = False
+            _http_pool = httpx.Client(
+                limits=httpx.Limits(
+                    max_keepalive_connections=32,
+                    max_connections=64,
+                    keepalive_expiry=60.0,
+                ),
+                http2=http2,
+                timeout=timeout,
+            )
+            litellm.client_session = _http_pool
+        _http_pool_refs += 1
+        return True
+
+
+def _release_http_pool() -> None:
+    """释放一个连接池引用，最后一个引用释放时关闭连接池并从 LiteLLM 卸载"""
+    global _http_pool, _http_pool_refs
+    with _http_pool_lock:
+        _http_pool_refs -= 1
+        if _http_pool_refs > 0 or _http_pool is None:
+            return
+        session = _http_pool
+        _http_pool = None
+        if litellm.client_session is session:
+            litellm.client_session = None
+    session.close()
+
+
+class _AsyncRateLimiter:
+    """简单的异步限速器：保证相邻两次 acquire 间隔不小于 1/qps 秒"""
+
+    def __init__(self, qps: float):
+        self._interval = 1.0 / qps
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            wait = self._next_at - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_at = max(loop.time(), self._next_at) + self._interval
 
 
 class AIClient:
     """统一的 AI 客户端（基于 LiteLLM）"""
 
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], debug: bool = False):
         """
         初始化 AI 客户端
 
         Args:
+            debug: 是否输出调试信息（完整模型响应、工具结果预览）
             config: AI 配置字典
                 - MODEL: 模型标识（格式: provider/model_name）
                 - API_KEY: API 密钥
@@ -31,6 +132,21 @@ class AIClient:
                 - TIMEOUT: 请求超时时间（秒）
                 - NUM_RETRIES: 重试次数（可选）
                 - FALLBACK_MODELS: 备用模型列表（可选）
+                - TOOL_CONCURRENCY: 同一轮内工具调用的最大并发数（可选）
+                - CACHE: 自定义响应缓存对象，需提供 get/set（可选）
+                - CACHE_SIZE: 默认响应缓存的最大条目数，0 表示禁用（可选）
+                - CACHE_TTL: 响应缓存过期时间（秒），0 表示不过期（可选）
+                - FORCE_CACHE: temperature > 0 时仍启用响应缓存（可选）
+                - SEMANTIC_CACHE: 是否启用语义缓存（需 faiss-cpu + sentence-transformers，可选）
+                - SEMANTIC_CACHE_MODEL: 语义缓存向量模型（可选）
+                - SEM_THRESHOLD: 语义缓存命中的相似度阈值（可选）
+                - ENABLE_PROMPT_CACHE: 是否为长 system 提示词标记服务端前缀缓存（可选）
+                - PROMPT_CACHE_MIN_CHARS: 标记前缀缓存的 system 提示词最小长度（可选）
+                - HTTP_POOL: 是否复用共享 HTTP 连接池（可选，默认开启）
+                - TOOL_HISTORY_WINDOW: 工具循环保留的最近消息对数，0 表示不裁剪（可选）
+                - MAX_BUDGET_TOKENS: 单次工具循环的 token 预算，超出后提前收尾（可选）
+                - ROUTER_MODEL: 工具选择轮使用的轻量模型，最终回答仍由 MODEL 生成（可选）
+                - MAX_TOOL_RESULT_CHARS: 单条工具结果回传给模型的最大字符数，0 表示不限制（可选）
         """
         self.model = config.get("MODEL", "deepseek/deepseek-chat")
         self.api_key = config.get("API_KEY") or os.environ.get("AI_API_KEY", "")
@@ -40,6 +156,63 @@ class AIClient:
         self.timeout = config.get("TIMEOUT", 120)
         self.num_retries = config.get("NUM_RETRIES", 2)
         self.fallback_models = config.get("FALLBACK_MODELS", [])
+        self.router_model = config.get("ROUTER_MODEL", "")
+        self.debug = debug
+
+        # 静态请求参数，每次请求复制后合并消息与覆盖项
+        self._base_params = self._make_base_params()
+
+        # Token 用量与费用统计（供监控及预算控制）
+        self.max_budget_tokens = config.get("MAX_BUDGET_TOKENS", 0)
+        self.total_prompt_tokens = 0
+        self.total_completion_tokens = 0
+        self.total_cost = 0.0
+        self.request_count = 0
+        self._usage_lock = threading.Lock()
+
+        # Function Calling 支持情况（None 表示尚未检测或无法识别）
+        self._supports_tools: Optional[bool] = None
+
+        # 工具调用线程池（同一轮的多个 tool_calls 并发执行）
+        self._tool_pool = ThreadPoolExecutor(
+            max_workers=max(1, config.get("TOOL_CONCURRENCY", 8)),
+            thread_name_prefix="ai-tool",
+        )
+
+        # 工具循环历史窗口（按消息对计），限制每轮重复发送的上下文
+        self.tool_history_window = config.get("TOOL_HISTORY_WINDOW", 12)
+        self.max_tool_result_chars = config.get("MAX_TOOL_RESULT_CHARS", 8000)
+
+        # 响应缓存（默认仅在 temperature == 0 时生效，避免缓存随机输出）
+        self.force_cache = config.get("FORCE_CACHE", False)
+        self._cache = config.get("CACHE")
+        if self._cache is None and config.get("CACHE_SIZE", 256) > 0:
+            self._cache = ResponseCache(
+                max_size=config.get("CACHE_SIZE", 256),
+                ttl=config.get("CACHE_TTL", 0),
+            )
+
+        # 复用 HTTP 连接，避免每次请求重新握手
+        self._holds_http_pool = False
+        if config.get("HTTP_POOL", True):
+            self._holds_http_pool = _acquire_http_pool(self.timeout)
+
+        # 进行中的相同请求（single-flight 合并并发的重复请求）
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._ainflight: Dict[str, "asyncio.Future[str]"] = {}
+
+        # 服务端前缀缓存（Prompt Caching）
+        self.enable_prompt_cache = config.get("ENABLE_PROMPT_CACHE", True)
+        self.prompt_cache_min_chars = config.get("PROMPT_CACHE_MIN_CHARS", 2048)
+
+        # 语义缓存（近似提示词复用响应，与精确缓存使用相同的启用条件）
+        self._semantic_cache: Optional[SemanticCache] = None
+        if config.get("SEMANTIC_CACHE", False):
+            self._semantic_cache = SemanticCache(
+                model_name=config.get("SEMANTIC_CACHE_MODEL", "mixedbread-ai/mxbai-embed-large-v1"),
+                threshold=config.get("SEM_THRESHOLD", 0.92),
+            )
 
     def chat(
         self,
@@ -61,20 +234,343 @@ class AIClient:
         """
         params = self._build_params(messages, **kwargs)
 
-        # 调用 LiteLLM
+        # 命中响应缓存则直接返回
+        cache_key = self._cache_key(params)
+        cached, sem_vector = self._cache_get(cache_key, messages)
+        if cached is not None:
+            return cached
+
+        if cache_key is None:
+            return self._request_content(params)
+
+        # 相同请求正在进行中则等待其结果，不重复发起
+        with self._inflight_lock:
+            future = self._inflight.get(cache_key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[cache_key] = future
+        if not owner:
+            return future.result()
+
+        try:
+            content = self._request_content(params)
+            self._cache_put(cache_key, sem_vector, content)
+            future.set_result(content)
+            return content
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(cache_key, None)
+
+    def _request_content(self, params: Dict[str, Any]) -> str:
+        """调用 LiteLLM 并提取响应内容"""
         response = completion(**params)
+        self._record_usage(response)
+        return response.choices[0].message.content
+
+    async def achat(
+        self,
+        messages: List[Dict[str, str]],
+        **kwargs
+    ) -> str:
+        """
+        异步调用 AI 模型进行对话（基于 litellm.acompletion）
+
+        与 chat() 参数一致，可在同一事件循环中并发发起多个请求。
+
+        Args:
+            messages: 消息列表
+            **kwargs: 额外参数，会覆盖默认配置
+
+        Returns:
+            str: AI 响应内容
+        """
+        params = self._build_params(messages, **kwargs)
+
+        cache_key = self._cache_key(params)
+        cached, sem_vector = self._cache_get(cache_key, messages)
+        if cached is not None:
+            return cached
+
+        if cache_key is None:
+            return await self._arequest_content(params)
 
-        # 提取响应内容
+        # 同一事件循环内协程串行调度，查询与登记之间无需加锁
+        future = self._ainflight.get(cache_key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._ainflight[cache_key] = future
+        try:
+            content = await self._arequest_content(params)
+            self._cache_put(cache_key, sem_vector, content)
+            future.set_result(content)
+            return content
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 标记异常已读取，避免无人等待时告警
+            raise
+        finally:
+            self._ainflight.pop(cache_key, None)
+
+    async def _arequest_content(self, params: Dict[str, Any]) -> str:
+        """异步调用 LiteLLM 并提取响应内容"""
+        response = await acompletion(**params)
+        self._record_usage(response)
         return response.choices[0].message.content
 
-    def _build_params(self, messages: List[Dict], **kwargs) -> Dict[str, Any]:
-        """构建 LiteLLM completion 请求参数（chat 和 chat_with_tools 共用）。"""
+    def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        **kwargs
+    ) -> Iterator[str]:
+        """
+        流式调用 AI 模型，边生成边返回文本片段
+
+        流式输出不经过响应缓存。
+
+        Args:
+            messages: 消息列表
+            **kwargs: 额外参数，会覆盖默认配置
+
+        Yields:
+            str: 增量文本片段
+        """
+        params = self._build_params(messages, **kwargs)
+        params["stream"] = True
+        for chunk in completion(**params):
+            delta = self._chunk_text(chunk)
+            if delta:
+                yield delta
+
+    async def astream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        异步流式调用 AI 模型（stream_chat 的异步版本）
+
+        Yields:
+            str: 增量文本片段
+        """
+        params = self._build_params(messages, **kwargs)
+        params["stream"] = True
+        response = await acompletion(**params)
+        async for chunk in response:
+            delta = self._chunk_text(chunk)
+            if delta:
+                yield delta
+
+    @staticmethod
+    def _chunk_text(chunk: Any) -> Optional[str]:
+        """提取流式响应分片中的文本增量"""
+        if not chunk.choices:
+            return None
+        return chunk.choices[0].delta.content
+
+    def _complete(
+        self,
+        params: Dict[str, Any],
+        on_delta: Optional[Callable[[str], None]] = None,
+    ) -> Any:
+        """
+        发起 completion 请求；提供 on_delta 时以流式方式请求，
+        逐段回调文本，并将分片重组为完整响应（保留 tool_calls）。
+        """
+        if on_delta is None:
+            response = completion(**params)
+        else:
+            chunks = []
+            # 覆盖调用方传入的 stream，避免与关键字参数重复；复制后修改，不影响调用方的参数字典
+            params = dict(params)
+            params["stream"] = True
+            for chunk in completion(**params):
+                chunks.append(chunk)
+                delta = self._chunk_text(chunk)
+                if delta:
+                    on_delta(delta)
+            response = self._build_stream_response(chunks, params["messages"])
+        self._record_usage(response)
+        return response
+
+    @staticmethod
+    def _build_stream_response(chunks: List[Any], messages: List[Dict[str, Any]]) -> Any:
+        """将流式分片重组为完整响应；流中没有任何分片时 stream_chunk_builder 返回 None，直接报错"""
+        response = litellm.stream_chunk_builder(chunks, messages=messages) if chunks else None
+        if response is None:
+            raise RuntimeError("模型流式响应为空：未收到任何分片")
+        return response
+
+    async def _acomplete(
+        self,
+        params: Dict[str, Any],
+        on_delta: Optional[Callable[[str], None]] = None,
+    ) -> Any:
+        """_complete 的异步版本"""
+        if on_delta is None:
+            response = await acompletion(**params)
+        else:
+            chunks = []
+            params = dict(params)
+            params["stream"] = True
+            stream = await acompletion(**params)
+            async for chunk in stream:
+                chunks.append(chunk)
+                delta = self._chunk_text(chunk)
+                if delta:
+                    on_delta(delta)
+            response = self._build_stream_response(chunks, params["messages"])
+        self._record_usage(response)
+        return response
+
+    async def achat_many(
+        self,
+        batch: List[List[Dict[str, str]]],
+        concurrency: int = 8,
+        qps: Optional[float] = None,
+        output_jsonl: Optional[str] = None,
+        **kwargs
+    ) -> List[str]:
+        """
+        并发执行多组对话，返回结果与输入顺序一致
+
+        Args:
+            batch: 多组消息列表
+            concurrency: 最大并发请求数
+            qps: 每秒最多发起的请求数（可选，None 表示不限速）
+            output_jsonl: 断点续跑文件路径（可选）。每完成一条即追加一行
+                {"index": i, "content": "..."}，重新运行时跳过已完成的条目
+            **kwargs: 额外参数，会覆盖默认配置
+
+        Returns:
+            List[str]: 各组对话的响应内容
+        """
+        results: List[Optional[str]] = [None] * len(batch)
+        if output_jsonl:
+            for index, content in self._load_checkpoint(output_jsonl).items():
+                if 0 <= index < len(results):
+                    results[index] = content
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        limiter = _AsyncRateLimiter(qps) if qps else None
+        write_lock = asyncio.Lock()
+
+        async def _run_one(index: int, messages: List[Dict[str, str]]) -> None:
+            async with semaphore:
+                if limiter is not None:
+                    await limiter.acquire()
+                content = await self.achat(messages, **kwargs)
+            results[index] = content
+            if output_jsonl:
+                line = json.dumps({"index": index, "content": content}, ensure_ascii=False)
+                async with write_lock:
+                    with open(output_jsonl, "a", encoding="utf-8") as f:
+                        f.write(line + "\n")
+
+        await asyncio.gather(*(
+            _run_one(i, m) for i, m in enumerate(batch) if results[i] is None
+        ))
+        return results
+
+    def chat_batch(
+        self,
+        batch: List[List[Dict[str, str]]],
+        max_concurrency: int = 16,
+        qps: Optional[float] = None,
+        output_jsonl: Optional[str] = None,
+        **kwargs
+    ) -> List[str]:
+        """
+        同步批量对话（在新事件循环中运行 achat_many）
+
+        失败重试沿用 LiteLLM 的 num_retries 配置；配合 output_jsonl
+        可在中断后继续未完成的部分。
+
+        Args:
+            batch: 多组消息列表
+            max_concurrency: 最大并发请求数
+            qps: 每秒最多发起的请求数（可选）
+            output_jsonl: 断点续跑文件路径（可选）
+            **kwargs: 额外参数，会覆盖默认配置
+
+        Returns:
+            List[str]: 各组对话的响应内容，顺序与输入一致
+        """
+        return asyncio.run(self.achat_many(
+            batch,
+            concurrency=max_concurrency,
+            qps=qps,
+            output_jsonl=output_jsonl,
+            **kwargs
+        ))
+
+    @staticmethod
+    def _load_checkpoint(path: str) -> Dict[int, str]:
+        """读取断点续跑文件，返回 {索引: 响应内容}"""
+        done: Dict[int, str] = {}
+        if not os.path.exists(path):
+            return done
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    done[int(record["index"])] = record["content"]
+                except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                    # 忽略中断时写了一半的行
+                    continue
+        return done
+
+    def _cache_key(self, params: Dict[str, Any]) -> Optional[str]:
+        """计算响应缓存键；缓存未启用或输出具有随机性时返回 None。"""
+        if self._cache is None and self._semantic_cache is None:
+            return None
+        if params.get("temperature") != 0 and not self.force_cache:
+            return None
+        return make_cache_key(params)
+
+    def _cache_get(self, cache_key: Optional[str], messages: List[Dict]) -> tuple:
+        """
+        依次查询精确缓存和语义缓存
+
+        Returns:
+            tuple: (命中的响应或 None, 语义向量或 None，供未命中时写回)
+        """
+        if cache_key is None:
+            return None, None
+        if self._cache is not None:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                return cached, None
+        if self._semantic_cache is None:
+            return None, None
+        sem_vector = self._semantic_cache.embed(messages)
+        return self._semantic_cache.get(sem_vector), sem_vector
+
+    def _cache_put(self, cache_key: Optional[str], sem_vector: Any, content: Optional[str]) -> None:
+        """将响应写入精确缓存和语义缓存"""
+        if cache_key is None or not content:
+            return
+        if self._cache is not None:
+            self._cache.set(cache_key, content)
+        if self._semantic_cache is not None:
+            self._semantic_cache.set(sem_vector, content)
+
+    def semantic_cache_stats(self) -> Dict[str, Any]:
+        """返回语义缓存命中统计（未启用时为空字典）"""
+        return self._semantic_cache.stats() if self._semantic_cache is not None else {}
+
+    def _make_base_params(self) -> Dict[str, Any]:
+        """构建与消息无关的静态请求参数（初始化时计算一次）"""
         params = {
             "model": self.model,
-            "messages": messages,
-            "temperature": kwargs.get("temperature", self.temperature),
-            "timeout": kwargs.get("timeout", self.timeout),
-            "num_retries": kwargs.get("num_retries", self.num_retries),
+            "temperature": self.temperature,
+            "timeout": self.timeout,
+            "num_retries": self.num_retries,
         }
 
         if self.api_key:
@@ -83,33 +579,100 @@ class AIClient:
         if self.api_base:
             params["api_base"] = self.api_base
 
-        max_tokens = kwargs.get("max_tokens", self.max_tokens)
-        if max_tokens and max_tokens > 0:
-            params["max_tokens"] = max_tokens
+        if self.max_tokens and self.max_tokens > 0:
+            params["max_tokens"] = self.max_tokens
 
         if self.fallback_models:
             params["fallbacks"] = self.fallback_models
 
-        # 合并其他额外参数
-        for key, value in kwargs.items():
-            if key not in params:
-                params[key] = value
+        return params
+
+    def _build_params(self, messages: List[Dict], **kwargs) -> Dict[str, Any]:
+        """构建 LiteLLM completion 请求参数（chat 和 chat_with_tools 共用）。"""
+        params = self._base_params.copy()
+        params["messages"] = self._prepare_messages(messages)
+
+        # 合并调用方传入的覆盖参数
+        if kwargs:
+            params.update(kwargs)
+            max_tokens = kwargs.get("max_tokens", self.max_tokens)
+            if not (max_tokens and max_tokens > 0):
+                params.pop("max_tokens", None)
+
+        return params
+
+    def _final_params(
+        self,
+        last_params: Optional[Dict[str, Any]],
+        messages: List[Dict],
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        基于工具循环最后一轮的请求参数构建最终的无工具请求，
+        保证与循环内的运行配置一致（并恢复路由前的主模型）。
+        """
+        if last_params is None:
+            return self._build_params(messages, **kwargs)
 
+        params = last_params
+        params.pop("tools", None)
+        params.pop("tool_choice", None)
+        params["model"] = kwargs.get("model", self.model)
+        params["messages"] = self._prepare_messages(messages)
         return params
 
+    def _prepare_messages(self, messages: List[Dict]) -> List[Dict]:
+        """请求发出前的消息预处理（前缀缓存标记）"""
+        if self.enable_prompt_cache:
+            return self._mark_prompt_cache(messages)
+        return messages
+
+    def _mark_prompt_cache(self, messages: List[Dict]) -> List[Dict]:
+        """
+        为较长的首条 system 消息标记服务端前缀缓存断点。
+
+        Claude 系模型需要显式的 cache_control 标记，LiteLLM 会原样透传；
+        OpenAI / DeepSeek 等对相同前缀自动缓存，无需改写。
+        两种情况都要求前缀逐字节一致，因此时间戳等动态内容应放在
+        末尾的 user 消息中，而不是 system 提示词里。
+        """
+        if "claude" not in self.model.lower() or not messages:
+            return messages
+
+        first = messages[0]
+        if not isinstance(first, dict) or first.get("role") != "system":
+            return messages
+
+        content = first.get("content")
+        if not isinstance(content, str) or len(content) < self.prompt_cache_min_chars:
+            return messages
+
+        cached_system = {
+            "role": "system",
+            "content": [{
+                "type": "text",
+                "text": content,
+                "cache_control": {"type": "ephemeral"},
+            }],
+        }
+        return [cached_system] + list(messages[1:])
+
     def chat_with_tools(
         self,
         messages: List[Dict],
         tools: List[Dict],
         tool_executor: Callable[[str, Dict], str],
         max_rounds: int = 30,
+        on_delta: Optional[Callable[[str], None]] = None,
+        tool_batch_executor: Optional[Callable[[List[Tuple[str, Dict]]], List[str]]] = None,
         **kwargs
     ) -> str:
         """
         带工具调用的对话（Function Calling / Tool Use）。
 
         模型可在生成过程中请求调用工具，客户端执行工具后将结果反馈给模型，
-        循环直到模型返回最终文本或达到最大轮数。
+        循环直到模型返回最终文本或达到最大轮数。同一轮返回的多个工具调用
+        在线程池中并发执行，结果按原顺序回填。
 
         若当前模型不支持 function calling，自动降级为普通 chat()。
 
@@ -118,87 +681,455 @@ class AIClient:
             tools: 工具 JSON Schema 列表（OpenAI tools 格式）
             tool_executor: 工具执行回调，签名 (function_name, arguments_dict) -> str
             max_rounds: 最大工具调用轮数（防止无限循环）
-            **kwargs: 额外参数，会覆盖默认配置
+            on_delta: 流式文本回调（可选）。提供时各轮请求以流式方式发出，
+                最终回答边生成边回调；工具调用轮仍等待完整消息后再执行工具
+            tool_batch_executor: 批量工具执行回调（可选），签名
+                [(function_name, arguments_dict), ...] -> [str, ...]。提供时每轮的
+                工具调用整体交给它执行（便于执行器合并/并发请求），结果顺序需与输入一致
+            **kwargs: 额外参数，会覆盖默认配置。max_budget_tokens 可覆盖
+                本次调用的 token 预算，超出后停止工具调用并直接请求最终回答
 
         Returns:
             str: AI 最终响应内容
         """
+        budget = kwargs.pop("max_budget_tokens", self.max_budget_tokens)
+
         # 检测模型是否支持 function calling
-        try:
-            if not litellm.supports_function_calling(model=self.model):
-                print(f"[AI] 模型 {self.model} 不支持 Function Calling，降级为普通对话")
-                return self.chat(messages, **kwargs)
-        except Exception:
+        supported = self._tools_supported()
+        if supported is False:
+            print(f"[AI] 模型 {self.model} 不支持 Function Calling，降级为普通对话")
+            return self.chat(messages, **kwargs)
+        if supported is None:
             # supports_function_calling 可能对未知模型抛异常，安全降级
             print(f"[AI] 无法检测模型 {self.model} 的 Function Calling 支持情况，尝试继续")
 
+        router_model = self._active_router_model()
+
         # 复制消息列表，避免修改原始数据
         messages = list(messages)
+        head_len = len(messages)  # 调用方传入的原始消息始终保留
 
         tool_call_seq = 0  # 全局工具调用计数器
+        used_tokens = 0
+        last_params: Optional[Dict[str, Any]] = None
+        recent_calls: deque = deque(maxlen=3)  # 最近几轮的工具调用签名，用于检测死循环
 
         for round_idx in range(max_rounds):
             params = self._build_params(messages, **kwargs)
+            last_params = params
             params["tools"] = tools
             params["tool_choice"] = "auto"
+            if router_model:
+                params["model"] = router_model
 
-            response = completion(**params)
+            # 路由模型的输出不是最终回答，不转发给流式回调
+            response = self._complete(params, None if router_model else on_delta)
+            used_tokens += self._usage_tokens(response)
             response_message = response.choices[0].message
 
-            # 调试输出完整响应内容，便于排查问题
-            try:
-                print("[AI][debug] response_message.role:", getattr(response_message, "role", None))
-                print("[AI][debug] response_message.content:", getattr(response_message, "content", None))
-                print("[AI][debug] response_message.tool_calls:", getattr(response_message, "tool_calls", None))
-            except Exception as e:
-                print(f"[AI][debug] 打印 response_message 失败: {e}")
+            # 调试模式下输出完整响应内容，便于排查问题
+            if self.debug:
+                self._print_response_debug(response_message)
 
             # 如果模型没有请求工具调用，返回最终内容
             if not response_message.tool_calls:
+                if router_model:
+                    # 路由模型只负责选择工具，最终回答交给主模型生成
+                    print(f"[AI] 路由模型工具调用结束（第 {round_idx + 1} 轮，共 {tool_call_seq} 次工具调用），"
+                          f"由 {self.model} 生成最终回答")
+                    break
                 content = response_message.content or ""
                 print(f"[AI] 模型响应完成（第 {round_idx + 1} 轮，共 {tool_call_seq} 次工具调用，{len(content)} 字符）")
                 return content
 
+            # 连续多轮请求完全相同的工具调用，视为陷入循环
+            if self._is_tool_loop(recent_calls, response_message.tool_calls):
+                self._append_loop_notice(messages, response_message.tool_calls)
+                break
+
             # 模型请求了工具调用 —— 追加 assistant 消息
             messages.append(response_message)
 
-            # 逐个执行工具调用
-            for tool_call in response_message.tool_calls:
-                func_name = tool_call.function.name
-                try:
-                    func_args = json.loads(tool_call.function.arguments)
-                except (json.JSONDecodeError, TypeError):
-                    func_args = {}
-
-                tool_call_seq += 1
-                print(f"[AI] 工具调用 #{tool_call_seq}: {func_name}({func_args})")
-
-                # 执行工具
-                tool_result = tool_executor(func_name, func_args)
-
-                # 打印工具返回结果（截断避免日志过长）
-                result_preview = tool_result[:400] if len(tool_result) > 400 else tool_result
-                print(f"[AI] 工具结果 #{tool_call_seq} ({func_name}): "
-                      f"[{len(tool_result)} 字符]\n{result_preview}")
-                if len(tool_result) > 400:
-                    print(f"[AI] ... 结果已截断，完整长度 {len(tool_result)} 字符")
-
-                # 追加工具结果消息
-                messages.append({
-                    "tool_call_id": tool_call.id,
-                    "role": "tool",
-                    "name": func_name,
-                    "content": tool_result,
-                })
-
-        # 达到最大轮数后，做一次不带 tools 的请求以获取最终回答
-        print(f"[AI] 已达最大工具调用轮数 ({max_rounds})，请求最终回答")
-        params = self._build_params(messages, **kwargs)
-        response = completion(**params)
+            # 并发执行本轮工具调用，结果按原顺序追加（tool_call_id 需与请求一一对应）
+            queued: List[tuple] = []
+            if tool_batch_executor is not None:
+                submit = self._queue_tool_call(queued)
+            else:
+                submit = lambda name, args: self._tool_pool.submit(tool_executor, name, args)
+            pending, tool_call_seq = self._dispatch_tool_calls(
+                response_message.tool_calls, submit, tool_call_seq
+            )
+            if queued:
+                batch_results = tool_batch_executor([(name, args) for name, args, _ in queued])
+                self._resolve_tool_batch(queued, batch_results)
+
+            for tool_call, seq, future in pending:
+                messages.append(self._tool_result_message(tool_call, seq, future.result()))
+
+            messages = self._trim_tool_history(messages, head_len)
+
+            if budget and used_tokens >= budget:
+                print(f"[AI] 已用 {used_tokens} tokens，超出预算 ({budget})，请求最终回答")
+                break
+        else:
+            # 达到最大轮数后，做一次不带 tools 的请求以获取最终回答
+            print(f"[AI] 已达最大工具调用轮数 ({max_rounds})，请求最终回答")
+
+        params = self._final_params(last_params, messages, **kwargs)
+        response = self._complete(params, on_delta)
         content = response.choices[0].message.content or ""
         print(f"[AI] 模型最终响应完成（{len(content)} 字符）")
         return content
 
+    async def achat_with_tools(
+        self,
+        messages: List[Dict],
+        tools: List[Dict],
+        tool_executor: Callable[[str, Dict], str],
+        max_rounds: int = 30,
+        on_delta: Optional[Callable[[str], None]] = None,
+        tool_batch_executor: Optional[Callable[[List[Tuple[str, Dict]]], List[str]]] = None,
+        **kwargs
+    ) -> str:
+        """
+        带工具调用的异步对话，流程与 chat_with_tools() 一致。
+
+        模型请求通过 litellm.acompletion 发出；tool_executor 仍为同步回调，
+        在工具线程池中并发执行，避免阻塞事件循环。
+
+        Args:
+            messages: 消息列表
+            tools: 工具 JSON Schema 列表（OpenAI tools 格式）
+            tool_executor: 工具执行回调，签名 (function_name, arguments_dict) -> str
+            max_rounds: 最大工具调用轮数（防止无限循环）
+            on_delta: 流式文本回调（可选）。提供时各轮请求以流式方式发出，
+                最终回答边生成边回调；工具调用轮仍等待完整消息后再执行工具
+            tool_batch_executor: 批量工具执行回调（可选），签名
+                [(function_name, arguments_dict), ...] -> [str, ...]。提供时每轮的
+                工具调用整体交给它执行（便于执行器合并/并发请求），结果顺序需与输入一致
+            **kwargs: 额外参数，会覆盖默认配置。max_budget_tokens 可覆盖
+                本次调用的 token 预算，超出后停止工具调用并直接请求最终回答
+
+        Returns:
+            str: AI 最终响应内容
+        """
+        budget = kwargs.pop("max_budget_tokens", self.max_budget_tokens)
+
+        supported = self._tools_supported()
+        if supported is False:
+            print(f"[AI] 模型 {self.model} 不支持 Function Calling，降级为普通对话")
+            return await self.achat(messages, **kwargs)
+        if supported is None:
+            print(f"[AI] 无法检测模型 {self.model} 的 Function Calling 支持情况，尝试继续")
+
+        router_model = self._active_router_model()
+
+        messages = list(messages)
+        head_len = len(messages)
+        tool_call_seq = 0
+        used_tokens = 0
+        last_params: Optional[Dict[str, Any]] = None
+        recent_calls: deque = deque(maxlen=3)  # 最近几轮的工具调用签名，用于检测死循环
+
+        for round_idx in range(max_rounds):
+            params = self._build_params(messages, **kwargs)
+            last_params = params
+            params["tools"] = tools
+            params["tool_choice"] = "auto"
+            if router_model:
+                params["model"] = router_model
+
+            response = await self._acomplete(params, None if router_model else on_delta)
+            used_tokens += self._usage_tokens(response)
+            response_message = response.choices[0].message
+            if self.debug:
+                self._print_response_debug(response_message)
+
+            if not response_message.tool_calls:
+                if router_model:
+                    print(f"[AI] 路由模型工具调用结束（第 {round_idx + 1} 轮，共 {tool_call_seq} 次工具调用），"
+                          f"由 {self.model} 生成最终回答")
+                    break
+                content = response_message.content or ""
+                print(f"[AI] 模型响应完成（第 {round_idx + 1} 轮，共 {tool_call_seq} 次工具调用，{len(content)} 字符）")
+                return content
+
+            if self._is_tool_loop(recent_calls, response_message.tool_calls):
+                self._append_loop_notice(messages, response_message.tool_calls)
+                break
+
+            messages.append(response_message)
+
+            loop = asyncio.get_running_loop()
+            queued: List[tuple] = []
+            if tool_batch_executor is not None:
+                submit = self._queue_tool_call(queued)
+            else:
+                submit = lambda name, args: loop.run_in_executor(self._tool_pool, tool_executor, name, args)
+            pending, tool_call_seq = self._dispatch_tool_calls(
+                response_message.tool_calls, submit, tool_call_seq
+            )
+
+            if queued:
+                batch_results = await loop.run_in_executor(
+                    self._tool_pool,
+                    tool_batch_executor,
+                    [(name, args) for name, args, _ in queued],
+                )
+                self._resolve_tool_batch(queued, batch_results)
+                results = [future.result() for _, _, future in pending]
+            else:
+                results = await asyncio.gather(*(future for _, _, future in pending))
+            for (tool_call, seq, _), tool_result in zip(pending, results):
+                messages.append(self._tool_result_message(tool_call, seq, tool_result))
+
+            messages = self._trim_tool_history(messages, head_len)
+
+            if budget and used_tokens >= budget:
+                print(f"[AI] 已用 {used_tokens} tokens，超出预算 ({budget})，请求最终回答")
+                break
+        else:
+            print(f"[AI] 已达最大工具调用轮数 ({max_rounds})，请求最终回答")
+
+        params = self._final_params(last_params, messages, **kwargs)
+        response = await self._acomplete(params, on_delta)
+        content = response.choices[0].message.content or ""
+        print(f"[AI] 模型最终响应完成（{len(content)} 字符）")
+        return content
+
+    @staticmethod
+    def _usage_tokens(response: Any) -> int:
+        """读取响应的总 token 数（无 usage 信息时为 0）"""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return 0
+        return (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+
+    def _record_usage(self, response: Any) -> None:
+        """累计 token 用量与费用"""
+        usage = getattr(response, "usage", None)
+        prompt_tokens = (getattr(usage, "prompt_tokens", 0) or 0) if usage else 0
+        completion_tokens = (getattr(usage, "completion_tokens", 0) or 0) if usage else 0
+        try:
+            cost = litellm.completion_cost(completion_response=response) or 0.0
+        except Exception:
+            # 未收录定价的模型无法计算费用
+            cost = 0.0
+
+        with self._usage_lock:
+            self.request_count += 1
+            self.total_prompt_tokens += prompt_tokens
+            self.total_completion_tokens += completion_tokens
+            self.total_cost += cost
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        返回累计用量统计
+
+        Returns:
+            dict: 请求次数、prompt/completion/总 token 数、估算费用（美元）
+        """
+        with self._usage_lock:
+            return {
+                "requests": self.request_count,
+                "prompt_tokens": self.total_prompt_tokens,
+                "completion_tokens": self.total_completion_tokens,
+                "total_tokens": self.total_prompt_tokens + self.total_completion_tokens,
+                "cost_usd": round(self.total_cost, 6),
+            }
+
+    def _active_router_model(self) -> str:
+        """返回可用于工具选择轮的路由模型；未配置或不支持 Function Calling 时为空"""
+        if not self.router_model or self.router_model == self.model:
+            return ""
+        if _supports_function_calling(self.router_model) is False:
+            print(f"[AI] 路由模型 {self.router_model} 不支持 Function Calling，全程使用 {self.model}")
+            return ""
+        print(f"[AI] 工具选择使用路由模型 {self.router_model}，最终回答使用 {self.model}")
+        return self.router_model
+
+    def _tools_supported(self) -> Optional[bool]:
+        """当前模型是否支持 Function Calling（首次查询后缓存在实例上）"""
+        if self._supports_tools is None:
+            self._supports_tools = _supports_function_calling(self.model)
+        return self._supports_tools
+
+    def _trim_tool_history(self, messages: List[Any], head_len: int) -> List[Any]:
+        """
+        裁剪工具循环中较早的消息，只保留原始消息和最近的 N 对工具交互。
+
+        裁剪点对齐到 assistant 消息，保证每条 tool 消息都能找到
+        对应的 tool_call_id，不会留下孤立的工具结果。
+        """
+        if self.tool_history_window <= 0:
+            return messages
+
+        keep = self.tool_history_window * 2
+        tail_len = len(messages) - head_len
+        if tail_len <= keep:
+            return messages
+
+        cut = len(messages) - keep
+        while cut < len(messages) and self._message_role(messages[cut]) != "assistant":
+            cut += 1
+        if cut >= len(messages):
+            # 最近一轮的工具结果本身就超过窗口，保留最后一条 assistant 起的全部内容
+            cut = head_len
+            for i in range(len(messages) - 1, head_len - 1, -1):
+                if self._message_role(messages[i]) == "assistant":
+                    cut = i
+                    break
+
+        if cut <= head_len:
+            return messages
+        return messages[:head_len] + messages[cut:]
+
+    @staticmethod
+    def _message_role(message: Any) -> Optional[str]:
+        """获取消息角色（兼容 dict 与 LiteLLM Message 对象）"""
+        if isinstance(message, dict):
+            return message.get("role")
+        return getattr(message, "role", None)
+
+    @staticmethod
+    def _is_tool_loop(recent_calls: deque, tool_calls: List[Any]) -> bool:
+        """记录本轮工具调用签名，最近 maxlen 轮完全相同时返回 True"""
+        signature = tuple(sorted(
+            (tc.function.name, tc.function.arguments or "") for tc in tool_calls
+        ))
+        recent_calls.append(signature)
+        return len(recent_calls) == recent_calls.maxlen and len(set(recent_calls)) == 1
+
+    @staticmethod
+    def _append_loop_notice(messages: List[Any], tool_calls: List[Any]) -> None:
+        """提示模型停止重复调用，直接基于已有信息作答"""
+        names = "、".join(sorted({tc.function.name for tc in tool_calls}))
+        print(f"[AI] 检测到工具循环（重复调用 {names}），强制终止")
+        messages.append({
+            "role": "user",
+            "content": f"请不要再调用 {names}，直接根据已获得的信息给出最终回答。",
+        })
+
+    def _dispatch_tool_calls(
+        self,
+        tool_calls: List[Any],
+        submit: Callable[[str, Dict[str, Any]], Any],
+        seq: int,
+    ) -> tuple:
+        """
+        提交本轮工具调用，同名同参数的重复调用只执行一次并共享结果。
+
+        Args:
+            tool_calls: 模型返回的工具调用列表
+            submit: 提交回调，签名 (function_name, arguments_dict) -> future
+            seq: 当前全局工具调用计数
+
+        Returns:
+            tuple: ([(tool_call, 序号, future), ...], 更新后的计数)
+        """
+        pending = []
+        submitted: Dict[tuple, Any] = {}
+        for tool_call in tool_calls:
+            func_name = tool_call.function.name
+            key = (func_name, tool_call.function.arguments)
+            seq += 1
+
+            future = submitted.get(key)
+            if future is None:
+                func_args = self._parse_tool_args(tool_call)
+                print(f"[AI] 工具调用 #{seq}: {func_name}({func_args})")
+                future = submit(func_name, func_args)
+                submitted[key] = future
+            else:
+                print(f"[AI] 工具调用 #{seq}: {func_name} 与本轮已有调用重复，复用结果")
+            pending.append((tool_call, seq, future))
+
+        return pending, seq
+
+    @staticmethod
+    def _queue_tool_call(queued: List[tuple]) -> Callable[[str, Dict[str, Any]], Future]:
+        """返回一个只登记调用、稍后由批量执行统一回填结果的提交回调"""
+        def submit(name: str, args: Dict[str, Any]) -> Future:
+            future: Future = Future()
+            queued.append((name, args, future))
+            return future
+        return submit
+
+    @staticmethod
+    def _resolve_tool_batch(queued: List[tuple], results: List[str]) -> None:
+        """将批量执行结果按顺序回填到登记的 future"""
+        for i, (_, _, future) in enumerate(queued):
+            if i < len(results):
+                future.set_result(results[i])
+            else:
+                future.set_result("错误：批量工具调用未返回该调用的结果")
+
+    @staticmethod
+    def _parse_tool_args(tool_call: Any) -> Dict[str, Any]:
+        """解析工具调用参数（JSON 字符串），解析失败返回空字典。"""
+        try:
+            # json.JSONDecodeError 与 orjson.JSONDecodeError 均为 ValueError 子类
+            args = _json_loads(tool_call.function.arguments)
+        except (ValueError, TypeError):
+            return {}
+        return args if isinstance(args, dict) else {}
+
+    @staticmethod
+    def _print_response_debug(response_message: Any) -> None:
+        """调试输出模型响应的角色、内容和工具调用"""
+        try:
+            print("[AI][debug] response_message.role:", getattr(response_message, "role", None))
+            print("[AI][debug] response_message.content:", getattr(response_message, "content", None))
+            print("[AI][debug] response_message.tool_calls:", getattr(response_message, "tool_calls", None))
+        except Exception as e:
+            print(f"[AI][debug] 打印 response_message 失败: {e}")
+
+    def _tool_result_message(self, tool_call: Any, seq: int, tool_result: str) -> Dict[str, Any]:
+        """打印工具返回结果并构建 tool 角色消息。"""
+        func_name = tool_call.function.name
+
+        # 非调试模式只输出长度，调试模式附带结果预览（截断避免日志过长）
+        if self.debug:
+            result_preview = tool_result[:400]
+            print(f"[AI] 工具结果 #{seq} ({func_name}): "
+                  f"[{len(tool_result)} 字符]\n{result_preview}")
+            if len(tool_result) > 400:
+                print(f"[AI] ... 结果已截断，完整长度 {len(tool_result)} 字符")
+        else:
+            print(f"[AI] 工具结果 #{seq} ({func_name}): [{len(tool_result)} 字符]")
+
+        # 限制回传给模型的结果长度，避免超长结果推高每轮的输入 token
+        content = tool_result
+        limit = self.max_tool_result_chars
+        if limit and len(tool_result) > limit:
+            content = tool_result[:limit] + f"\n...[已截断 {len(tool_result) - limit} 字符]"
+
+        return {
+            "tool_call_id": tool_call.id,
+            "role": "tool",
+            "name": func_name,
+            "content": content,
+        }
+
+    def close(self) -> None:
+        """释放工具线程池及本实例持有的 HTTP 连接池引用（最后一个引用释放时关闭连接池）"""
+        self._tool_pool.shutdown(wait=False)
+        if self._holds_http_pool:
+            self._holds_http_pool = False
+            _release_http_pool()
+
+    def __enter__(self) -> "AIClient":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "AIClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
     def validate_config(self) -> tuple[bool, str]:
         """
         验证配置是否有效
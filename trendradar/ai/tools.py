@@ -7,274 +7,1090 @@ Tushare 工具模块
 龙虎榜和个股资金流向查询。
 """
 
+import asyncio
+import hashlib
 import json
 import os
-from typing import Any, Dict, List, Optional
-
-# Tushare 工具的 OpenAI tools JSON Schema 定义
-TUSHARE_TOOLS_SCHEMA: List[Dict[str, Any]] = [
-    {
-        "type": "function",
-        "function": {
-            "name": "get_concept_sector_daily",
-            "description": (
-                "获取同花顺概念板块日线行情数据，包括涨跌幅、成交量、换手率等。"
-                "可按板块代码和日期查询。板块代码来自概念板块列表（如 885311.TI）。"
-            ),
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "ts_code": {
-                        "type": "string",
-                        "description": "概念板块代码，如 885311.TI（智能电网）。来自概念板块列表。",
-                    },
-                    "trade_date": {
-                        "type": "string",
-                        "description": "交易日期，YYYYMMDD 格式，如 20260214。不填则返回最近交易日数据。",
-                    },
-                },
-                "required": [],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_concept_sector_members",
-            "description": (
-                "获取同花顺概念板块的成分股列表，返回板块包含的所有个股代码和名称。"
-                "可用于了解板块内有哪些龙头股。"
-            ),
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "ts_code": {
-                        "type": "string",
-                        "description": "概念板块代码，如 885311.TI（智能电网）。来自概念板块列表。",
-                    },
-                },
-                "required": ["ts_code"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_index_daily",
-            "description": (
-                "获取大盘指数日线行情数据，包括开盘、收盘、最高、最低、涨跌幅、成交量等。"
-                "常用指数代码：000001.SH（上证指数）、399001.SZ（深证成指）、399006.SZ（创业板指）。"
-            ),
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "ts_code": {
-                        "type": "string",
-                        "description": (
-                            "指数代码。常用：000001.SH（上证指数）、399001.SZ（深证成指）、"
-                            "399006.SZ（创业板指）、399300.SZ（沪深300）。"
-                        ),
-                    },
-                    "trade_date": {
-                        "type": "string",
-                        "description": "交易日期，YYYYMMDD 格式。不填则返回最近交易日数据。",
-                    },
-                },
-                "required": ["ts_code"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_stock_daily_basic",
-            "description": (
-                "获取个股每日重要指标，包括换手率、量比、市盈率（PE/PE_TTM）、市净率（PB）、"
-                "股息率、总市值、流通市值等。可按股票代码或交易日期查询。"
-            ),
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "ts_code": {
-                        "type": "string",
-                        "description": "股票代码，如 000001.SZ（平安银行）、600519.SH（贵州茅台）。",
-                    },
-                    "trade_date": {
-                        "type": "string",
-                        "description": "交易日期，YYYYMMDD 格式。不填则返回最近交易日数据。",
-                    },
-                },
-                "required": ["ts_code"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_stock_daily",
-            "description": (
-                "获取个股日线行情数据，包括开盘、收盘、最高、最低、昨收、涨跌幅、成交量、成交额。"
-                "用于判断个股当日涨跌幅度、是否接近涨停、量能变化等。"
-            ),
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "ts_code": {
-                        "type": "string",
-                        "description": "股票代码，如 000001.SZ（平安银行）、600519.SH（贵州茅台）。",
-                    },
-                    "trade_date": {
-                        "type": "string",
-                        "description": "交易日期，YYYYMMDD 格式。不填则返回最近交易日数据。",
-                    },
-                },
-                "required": ["ts_code"],
-            },
-        },
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache, wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from trendradar.ai.tushare_cache import TushareDiskCache
+
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj: Any, sort_keys: bool = False) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, option=option)
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps(obj: Any, sort_keys: bool = False) -> bytes:
+        # 与 orjson 输出一致：紧凑分隔符、保留非 ASCII 字符
+        return json.dumps(obj, sort_keys=sort_keys, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+# Tushare 工具的 OpenAI tools JSON Schema 定义（存放于同目录 JSON 文件，首次使用时加载）
+_TOOLS_SCHEMA_PATH = Path(__file__).parent / "tushare_tools_schema.json"
+
+
+# response_format="json" 时追加到各工具描述后的返回格式说明
+_JSON_RESULT_NOTE = (
+    "。返回 JSON：{\"title\": 结果说明, \"rows\": [记录, ...]}，"
+    "记录字段为 Tushare 原始字段名与原始单位，缺失值为 null"
+)
+
+
+@lru_cache(maxsize=None)
+def get_tools_schema(response_format: str = "text") -> List[Dict[str, Any]]:
+    """
+    获取 Tushare 工具的 OpenAI tools JSON Schema（首次调用时解析并缓存）。
+
+    Args:
+        response_format: 工具结果格式，"json" 时在各工具描述中说明 JSON 返回结构
+
+    Returns:
+        List[Dict]: tools 定义列表
+    """
+    schema = _json_loads(_TOOLS_SCHEMA_PATH.read_bytes())
+    if response_format == "json":
+        for tool in schema:
+            tool["function"]["description"] += _JSON_RESULT_NOTE
+    return schema
+
+
+@lru_cache(maxsize=None)
+def dump_schema(response_format: str = "text") -> bytes:
+    """
+    获取序列化后的 tools JSON（UTF-8 字节，首次调用时生成并缓存）。
+
+    需要直接发送原始请求体的调用方可复用该结果，避免每次重新序列化。
+    """
+    return _json_dumps(get_tools_schema(response_format))
+
+
+def __getattr__(name: str) -> Any:
+    # 兼容旧的模块常量名，按需加载 schema
+    if name == "TUSHARE_TOOLS_SCHEMA":
+        return get_tools_schema()
+    if name == "TUSHARE_TOOLS_SCHEMA_JSON":
+        return dump_schema()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# 各工具查询结果的缓存有效期（秒）：行情类数据短期有效，板块成分股变化缓慢
+TOOL_CACHE_TTL: Dict[str, int] = {
+    "get_concept_sector_daily": 60,
+    "get_concept_sector_members": 24 * 3600,
+    "get_index_daily": 60,
+    "get_stock_daily_basic": 60,
+    "get_stock_daily": 60,
+    "get_limit_list": 60,
+    "get_top_list": 60,
+    "get_moneyflow": 60,
+}
+
+# 指定了早于今天的 trade_date 的查询（已收盘的历史数据）统一使用的缓存有效期（秒）
+HISTORY_TOOL_CACHE_TTL = 24 * 3600
+
+# 查询结果缓存的最大条目数，超出后淘汰最久未使用的条目
+TOOL_CACHE_MAX_SIZE = 512
+
+# 查询结果磁盘缓存有效期（秒）：历史交易日数据基本不变，当日数据只短期复用
+DISK_CACHE_HISTORY_TTL = 30 * 24 * 3600
+DISK_CACHE_TODAY_TTL = 300
+
+
+# 工具参数格式校验（模块加载时编译一次），在发起网络请求前拦截明显错误的参数
+_STOCK_CODE_RE = re.compile(r"^\d{6}\.(SH|SZ|BJ)$")
+_INDEX_CODE_RE = re.compile(r"^\d{6}\.(SH|SZ|CSI|BJ)$")
+_THS_CODE_RE = re.compile(r"^\d{6}\.TI$")
+_TRADE_DATE_RE = re.compile(r"^\d{8}$")
+_LIMIT_TYPE_RE = re.compile(r"^[UDZ]$")
+
+# 涨跌停类型显示名称
+_LIMIT_LABELS = {"U": "涨停", "D": "跌停", "Z": "炸板"}
+
+# 资金流向分档：(字段名中缀, 显示名称)
+_MONEYFLOW_TIERS = (("sm", "小单"), ("md", "中单"), ("lg", "大单"), ("elg", "特大单"))
+
+_STOCK_CODE_RULE = (_STOCK_CODE_RE, "股票代码，如 000001.SZ、600519.SH")
+_TRADE_DATE_RULE = (_TRADE_DATE_RE, "YYYYMMDD 格式，如 20260214")
+
+# 工具名 -> {参数名: (正则, 格式说明)}
+_ARG_RULES: Dict[str, Dict[str, Tuple[Any, str]]] = {
+    "get_concept_sector_daily": {
+        "ts_code": (_THS_CODE_RE, "同花顺板块代码，如 885311.TI"),
+        "trade_date": _TRADE_DATE_RULE,
     },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_limit_list",
-            "description": (
-                "获取每日涨跌停股票列表，包括封单比、封单额、首次封板时间、开板次数、"
-                "涨停强度等。用于查看当日哪些股票涨停/跌停及其封板质量。"
-            ),
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "trade_date": {
-                        "type": "string",
-                        "description": "交易日期，YYYYMMDD 格式。不填则返回最近交易日数据。",
-                    },
-                    "limit_type": {
-                        "type": "string",
-                        "description": "涨跌停类型：U=涨停，D=跌停，Z=炸板。不填则返回全部。",
-                        "enum": ["U", "D", "Z"],
-                    },
-                    "ts_code": {
-                        "type": "string",
-                        "description": "股票代码，可选。填写则只返回该股票的涨跌停信息。",
-                    },
-                },
-                "required": [],
-            },
-        },
+    "get_concept_sector_members": {
+        "ts_code": (_THS_CODE_RE, "同花顺板块代码，如 885311.TI"),
     },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_top_list",
-            "description": (
-                "获取龙虎榜每日明细数据，包括上榜原因、买入额、卖出额、净买入额、"
-                "成交额占比等。可查看当日哪些股票上了龙虎榜及主力资金动向。"
-            ),
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "trade_date": {
-                        "type": "string",
-                        "description": "交易日期，YYYYMMDD 格式。不填则返回最近交易日数据。",
-                    },
-                    "ts_code": {
-                        "type": "string",
-                        "description": "股票代码，可选。填写则只返回该股票的龙虎榜信息。",
-                    },
-                },
-                "required": [],
-            },
-        },
+    "get_index_daily": {
+        "ts_code": (_INDEX_CODE_RE, "指数代码，如 000001.SH、399001.SZ"),
+        "trade_date": _TRADE_DATE_RULE,
     },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_moneyflow",
-            "description": (
-                "获取个股资金流向数据，包括大单、中单、小单的买入卖出金额和净流入。"
-                "用于判断主力资金是否在流入或流出某只股票。"
-            ),
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "ts_code": {
-                        "type": "string",
-                        "description": "股票代码，如 000001.SZ（平安银行）。",
-                    },
-                    "trade_date": {
-                        "type": "string",
-                        "description": "交易日期，YYYYMMDD 格式。不填则返回最近交易日数据。",
-                    },
-                },
-                "required": ["ts_code"],
-            },
-        },
+    "get_stock_daily_basic": {"ts_code": _STOCK_CODE_RULE, "trade_date": _TRADE_DATE_RULE},
+    "get_stock_daily": {"ts_code": _STOCK_CODE_RULE, "trade_date": _TRADE_DATE_RULE},
+    "get_limit_list": {
+        "trade_date": _TRADE_DATE_RULE,
+        "limit_type": (_LIMIT_TYPE_RE, " U（涨停）、D（跌停）或 Z（炸板）"),
+        "ts_code": _STOCK_CODE_RULE,
     },
-]
+    "get_top_list": {"trade_date": _TRADE_DATE_RULE, "ts_code": _STOCK_CODE_RULE},
+    "get_moneyflow": {"ts_code": _STOCK_CODE_RULE, "trade_date": _TRADE_DATE_RULE},
+}
+
+# 必填参数
+_REQUIRED_ARGS: Dict[str, Tuple[str, ...]] = {
+    "get_concept_sector_members": ("ts_code",),
+    "get_index_daily": ("ts_code",),
+    "get_stock_daily_basic": ("ts_code",),
+    "get_stock_daily": ("ts_code",),
+    "get_moneyflow": ("ts_code",),
+}
+
+# 分析开始时预取的常用指数：上证指数、深证成指、创业板指
+HOT_INDEX_CODES: Tuple[str, ...] = ("000001.SH", "399001.SZ", "399006.SZ")
+
+# 查询无数据的代码在该时间内（秒）直接拒绝，避免模型反复重试同一个错误代码
+BAD_CODE_TTL = 300
+
+# 不指定日期仍查不到数据即可判定代码有误的工具（涨跌停、龙虎榜等筛选类工具查不到是正常结果）
+_CODE_CHECK_TOOLS = frozenset({
+    "get_concept_sector_members",
+    "get_index_daily",
+    "get_stock_daily_basic",
+    "get_stock_daily",
+    "get_moneyflow",
+})
+
+
+@lru_cache(maxsize=None)
+def _schema_validators() -> Optional[Dict[str, Callable[[Any], Any]]]:
+    """
+    按 tools schema 编译各工具的参数校验函数（需要 fastjsonschema，未安装时返回 None）。
+
+    在 schema 基础上禁止未定义的参数，编译结果在进程内缓存。
+    """
+    try:
+        import fastjsonschema
+    except ImportError:
+        return None
+    return {
+        tool["function"]["name"]: fastjsonschema.compile(
+            {**tool["function"]["parameters"], "additionalProperties": False}
+        )
+        for tool in get_tools_schema()
+    }
+
+
+def _validate_args(function_name: str, arguments: Dict[str, Any]) -> Optional[str]:
+    """
+    校验工具参数，返回错误提示；参数合法时返回 None。
+
+    已安装 fastjsonschema 时先用编译后的 schema 校验参数结构（类型、未定义参数），
+    再按 _ARG_RULES 校验代码与日期格式。
+
+    Args:
+        function_name: 工具函数名
+        arguments: 函数参数字典
+    """
+    rules = _ARG_RULES.get(function_name, {})
+    validators = _schema_validators()
+    validator = validators.get(function_name) if validators else None
+    if validator is not None:
+        import fastjsonschema
+
+        try:
+            # 模型对可选参数常传 null 或空字符串，均视为未填写（与下方逐项校验一致）
+            validator({k: v for k, v in arguments.items() if v is not None and v != ""})
+        except fastjsonschema.JsonSchemaException as e:
+            allowed = "、".join(rules) or "无"
+            return f"错误：{function_name} 参数不符合定义（{e.message}；可用参数：{allowed}）"
+    for name, value in arguments.items():
+        rule = rules.get(name)
+        if rule is None:
+            allowed = "、".join(rules) or "无"
+            return f"错误：{function_name} 不支持参数 '{name}'（可用参数：{allowed}）"
+        if value is None or value == "":
+            continue
+        pattern, hint = rule
+        if not isinstance(value, str) or not pattern.match(value):
+            return f"错误：参数 {name}={value!r} 格式不正确，应为{hint}"
+    for name in _REQUIRED_ARGS.get(function_name, ()):
+        if not arguments.get(name):
+            return f"错误：{function_name} 缺少必填参数 '{name}'"
+    return None
+
+
+# 个股/指数类接口的查询字段（只取输出中用到的列）
+_INDEX_DAILY_FIELDS = "trade_date,open,close,high,low,change,pct_chg,vol,amount"
+_DAILY_FIELDS = "trade_date,open,close,high,low,pre_close,pct_chg,vol,amount"
+_DAILY_BASIC_FIELDS = (
+    "trade_date,close,turnover_rate,turnover_rate_f,"
+    "volume_ratio,pe,pe_ttm,pb,ps,dv_ratio,total_mv,circ_mv"
+)
+_MONEYFLOW_FIELDS = (
+    "trade_date,"
+    "buy_sm_amount,sell_sm_amount,buy_md_amount,sell_md_amount,"
+    "buy_lg_amount,sell_lg_amount,buy_elg_amount,sell_elg_amount,"
+    "net_mf_amount"
+)
+
+def _table_header(columns: str, width: int) -> str:
+    """拼接表头与分隔线（模块加载时生成一次）"""
+    return f"{columns}\n{'-' * width}"
+
+
+# 各表格工具的表头与分隔线（静态文本，导入时生成）
+_SECTOR_DAILY_HEADER = _table_header(
+    "板块代码 | 交易日 | 开盘 | 收盘 | 最高 | 最低 | 涨跌幅(%) | 成交量 | 换手率(%)", 80
+)
+_SECTOR_MEMBERS_HEADER = _table_header("股票代码 | 股票名称", 40)
+_INDEX_DAILY_HEADER = _table_header(
+    "交易日 | 开盘 | 收盘 | 最高 | 最低 | 涨跌点 | 涨跌幅(%) | 成交量(手) | 成交额(千元)", 100
+)
+_STOCK_DAILY_HEADER = _table_header(
+    "交易日 | 开盘 | 收盘 | 最高 | 最低 | 昨收 | 涨跌幅(%) | 成交量(手) | 成交额(千元)", 100
+)
+_LIMIT_LIST_HEADER = _table_header(
+    "代码 | 名称 | 收盘 | 涨跌幅(%) | 封单比 | 封单额(万) | 首封时间 | 开板次数 | 强度 | 类型", 110
+)
+_TOP_LIST_HEADER = _table_header(
+    "代码 | 名称 | 收盘 | 涨跌幅(%) | 龙虎榜买入(万) | 龙虎榜卖出(万) | "
+    "龙虎榜净买入(万) | 净买入占比(%) | 成交额占比(%) | 上榜原因",
+    140,
+)
+
+# 每日指标中保留两位小数的比率类列（按输出模板中的顺序）
+_DAILY_BASIC_RATIO_COLS = (
+    "turnover_rate", "turnover_rate_f", "volume_ratio",
+    "pe", "pe_ttm", "pb", "ps", "dv_ratio",
+)
+
+# 每日指标单个交易日的输出模板（按位置填入已格式化的各列）
+_DAILY_BASIC_BLOCK = (
+    "\n\n--- {} ---"
+    "\n收盘价: {}"
+    "\n换手率: {}%"
+    "\n换手率(自由流通): {}%"
+    "\n量比: {}"
+    "\n市盈率(PE): {}"
+    "\n市盈率(PE_TTM): {}"
+    "\n市净率(PB): {}"
+    "\n市销率(PS): {}"
+    "\n股息率: {}%"
+    "\n总市值: {}"
+    "\n流通市值: {}"
+)
+
+# 资金流向单个交易日的输出模板：交易日、各档（买入, 卖出, 净额）、主力净流入、总净流入
+_MONEYFLOW_BLOCK = (
+    "\n\n--- {} ---"
+    + "".join(f"\n{label}: 买入 {{}} / 卖出 {{}} / 净额 {{}}" for _, label in _MONEYFLOW_TIERS)
+    + "\n主力净流入(大单+特大单): {}"
+    + "\n总净流入: {}"
+)
+
+# 支持逗号分隔多个 ts_code 的工具：工具名 -> (Tushare 接口名, 查询字段, 格式化方法名)
+# 同一交易日对多只股票/指数的调用可合并为一次请求，再按 ts_code 拆分结果
+_MULTI_CODE_TOOLS: Dict[str, Tuple[str, str, str]] = {
+    "get_index_daily": ("index_daily", _INDEX_DAILY_FIELDS, "_format_index_daily"),
+    "get_stock_daily": ("daily", _DAILY_FIELDS, "_format_stock_daily"),
+    "get_stock_daily_basic": ("daily_basic", _DAILY_BASIC_FIELDS, "_format_stock_daily_basic"),
+    "get_moneyflow": ("moneyflow", _MONEYFLOW_FIELDS, "_format_moneyflow"),
+}
+
+
+def _text_col(df, col: str) -> List[str]:
+    """取文本列，缺失值与空字符串显示为 '-'。"""
+    if col not in df.columns:
+        return ["-"] * len(df.index)
+    s = df[col].astype(object)
+    return s.where(s.notna() & (s != ""), "-").astype(str).tolist()
+
+
+def _fmt_col(values, spec: str) -> List[str]:
+    """
+    按格式规格（如 '.2f'）整列格式化数值，缺失值显示为 '-'。
+
+    先统一转为 float 数组（None → NaN），用 np.char.mod 整列格式化，
+    再按缺失值掩码一次性替换为 '-'，不逐个单元格调用 format。
+    """
+    import numpy as np
+
+    arr = values.to_numpy(dtype=float, na_value=np.nan)
+    out = np.char.mod(f"%{spec}", arr).astype(object)
+    out[np.isnan(arr)] = "-"
+    return out.tolist()
+
+
+def _fmt_amount_col(values) -> List[str]:
+    """
+    整列格式化金额（万元），绝对值不小于 1 万（万元）时显示为亿，缺失值显示为 '-'。
+
+    Args:
+        values: 金额 Series 或数组
+
+    Returns:
+        List[str]: 格式化后的文本列
+    """
+    import numpy as np
+
+    arr = np.asarray(values, dtype=float)
+    big = np.abs(arr) >= 10000
+    out = np.where(
+        big,
+        np.char.add(np.char.mod("%.2f", arr / 10000), "亿"),
+        np.char.add(np.char.mod("%.0f", arr), "万"),
+    ).astype(object)
+    out[np.isnan(arr)] = "-"
+    return out.tolist()
+
+
+def _num_col(df, col: str, spec: str) -> List[str]:
+    """取数值列并按格式规格格式化，列不存在时整列显示为 '-'。"""
+    if col not in df.columns:
+        return ["-"] * len(df.index)
+    return _fmt_col(df[col], spec)
+
+
+def _fmt_mv_col(values) -> List[str]:
+    """
+    整列格式化市值（万元），不小于 1 万（万元）时显示为亿元，缺失值显示为 '-'。
+
+    Args:
+        values: 市值 Series 或数组
+
+    Returns:
+        List[str]: 格式化后的文本列
+    """
+    import numpy as np
+
+    arr = np.asarray(values, dtype=float)
+    out = np.where(
+        arr >= 10000,
+        np.char.add(np.char.mod("%.2f", arr / 10000), " 亿元"),
+        np.char.add(np.char.mod("%.2f", arr), " 万元"),
+    ).astype(object)
+    out[np.isnan(arr)] = "-"
+    return out.tolist()
+
+
+def _mv_col(df, col: str) -> List[str]:
+    """取市值列并格式化，列不存在时整列显示为 '-'。"""
+    if col not in df.columns:
+        return ["-"] * len(df.index)
+    return _fmt_mv_col(df[col].to_numpy(dtype=float, na_value=float("nan")))
+
+
+def _records_json(title: str, df) -> str:
+    """
+    将结果 DataFrame 序列化为紧凑 JSON：{"title": 标题, "rows": [行记录, ...]}，缺失值为 null。
+
+    Args:
+        title: 结果说明（含代码、条数等上下文）
+        df: 已截断的结果数据
+
+    Returns:
+        str: JSON 文本
+    """
+    rows = df.to_json(orient="records", force_ascii=False, double_precision=4)
+    return '{"title":' + _json_dumps(title).decode("utf-8") + ',"rows":' + rows + "}"
+
+
+def _truncate(df, n: int):
+    """限制返回行数：行数未超出时直接返回原 DataFrame，超出时按位置切片（不经过 head 的额外检查）"""
+    return df.iloc[:n] if len(df.index) > n else df
+
+
+def _join_rows(cols: List[List[str]]) -> str:
+    """将若干等长的已格式化字符串列按 ' | ' 拼接为行，再按换行拼接为一段文本。"""
+    return "\n".join(map(" | ".join, zip(*cols)))
+
+
+def _iter_table(title: str, header: str, cols: list, chunk_rows: int = 20) -> Iterator[str]:
+    """
+    分块产出表格文本：先产出标题与表头，再每 chunk_rows 行产出一块。
+
+    Args:
+        title: 标题行
+        header: 表头与分隔线（见 _table_header）
+        cols: 等长的已格式化字符串列
+        chunk_rows: 每块行数
+    """
+    yield f"{title}\n{header}\n"
+    for start in range(0, len(cols[0]), chunk_rows):
+        block = _join_rows([col[start:start + chunk_rows] for col in cols])
+        yield block if start == 0 else "\n" + block
+
+
+def _streamed(gen_func: Callable[..., Iterator[str]]) -> Callable[..., str]:
+    """
+    将分块产出文本的生成器方法包装为返回完整文本的方法。
+
+    原生成器保留在包装函数的 stream 属性上，供 stream_execute 逐块消费。
+    """
+    @wraps(gen_func)
+    def wrapper(*args, **kwargs) -> str:
+        return "".join(gen_func(*args, **kwargs))
+
+    wrapper.stream = gen_func
+    return wrapper
+
+
+# 原始数据（DataFrame）磁盘缓存有效期（秒）：按 Tushare 接口名配置，未配置的使用默认值；
+# 指定了早于今天的 trade_date 的查询为已收盘的历史数据，不再变化
+DATA_CACHE_TTL: Dict[str, int] = {
+    "ths_member": 24 * 3600,
+}
+DATA_CACHE_DEFAULT_TTL = 60
+HISTORY_DATA_CACHE_TTL = 30 * 24 * 3600
+
+
+@lru_cache(maxsize=None)
+def _parquet_available() -> bool:
+    """检查 parquet 读写依赖（pyarrow 或 fastparquet）是否可用"""
+    for module in ("pyarrow", "fastparquet"):
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            continue
+    print("[AI] Tushare 数据缓存需要安装 pyarrow，已禁用")
+    return False
+
+
+@lru_cache(maxsize=None)
+def _tushare_available() -> bool:
+    """检查 tushare 是否已安装（结果在进程内缓存）"""
+    try:
+        import tushare  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# Tushare 频率限制：超出每分钟调用次数时接口报错信息中包含该文本
+_RATE_LIMIT_MESSAGE = "每分钟最多访问该接口"
+RATE_LIMIT_MAX_RETRIES = 4
+RATE_LIMIT_BACKOFF_BASE = 0.5
+RATE_LIMIT_BACKOFF_MAX = 60
+
+
+class _TokenBucket:
+    """线程安全的令牌桶限速器：按每分钟配额匀速发放令牌，允许少量突发"""
+
+    def __init__(self, rate_per_minute: float, burst: int = 5):
+        self._rate = rate_per_minute / 60.0
+        self._capacity = float(max(1, burst))
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """获取一个令牌，不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+
+_tushare_session = None
+_tushare_session_lock = threading.Lock()
+
+
+class _SessionRequests:
+    """替代 tushare.pro.client 模块中的 requests 引用，将 post 转发到共享 Session"""
+
+    def __init__(self, session):
+        self._session = session
+
+    def post(self, *args, **kwargs):
+        return self._session.post(*args, **kwargs)
+
+    def __getattr__(self, name):
+        import requests
+        return getattr(requests, name)
+
+
+def _install_tushare_session() -> None:
+    """
+    让 tushare pro_api 复用 Keep-Alive 连接池
+
+    tushare 的 DataApi.query 每次直接调用 requests.post，都会重新建立 TCP/TLS 连接。
+    这里将其模块级 requests 引用替换为转发到共享 Session 的代理，仅安装一次。
+    """
+    global _tushare_session
+    with _tushare_session_lock:
+        if _tushare_session is not None:
+            return
+        try:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+            from tushare.pro import client as ts_client
+        except ImportError:
+            return
+        if not hasattr(ts_client, "requests"):
+            # 未来版本若不再通过模块级 requests 发请求，保持原样
+            return
+
+        # Tushare 查询是只读的，POST 也可以安全重试：连接失败与网关 5xx 在连接池层面重试，
+        # 不占用上层的工具调用轮次。重试耗尽后抛出异常，由 stream_execute 报告查询失败——
+        # 否则 tushare 会把错误响应转换为空 DataFrame，被当作“未查询到数据”缓存
+        retry = Retry(
+            total=2,
+            backoff_factor=0.3,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=None,
+            raise_on_status=True,
+        )
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        ts_client.requests = _SessionRequests(session)
+        _tushare_session = session
 
 
 class TushareToolExecutor:
     """Tushare 工具执行器，负责实际调用 Tushare API 并返回格式化文本。"""
 
-    def __init__(self, token: str):
+    # 进程内共享的 pro_api 客户端 {token: api}，短生命周期的执行器无需重复初始化
+    _api_cache: Dict[str, Any] = {}
+    _api_cache_lock = threading.Lock()
+
+    def __init__(
+        self,
+        token: str,
+        cache_dir: str = "",
+        rate_limit: int = 120,
+        response_format: str = "text",
+    ):
         """
         初始化 Tushare 工具执行器。
 
         Args:
             token: Tushare Pro API Token
+            cache_dir: 磁盘缓存目录（原始数据 parquet 与查询结果 JSON），为空时不启用磁盘缓存
+            rate_limit: 每分钟最多发起的 Tushare 请求数，0 表示不限速
+            response_format: 工具结果格式，"text" 为对齐的文本表格，"json" 为紧凑的 JSON 记录
+                （token 更少，模型无需再解析表格）
         """
-        self.token = token
+        self._token = token
         self._api = None
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._disk_cache = TushareDiskCache(cache_dir) if cache_dir else None
+        # 并发工具调用共享的限速器（Tushare 按账号限制每分钟调用次数）
+        self._rate_limiter = _TokenBucket(rate_limit) if rate_limit > 0 else None
+        self.response_format = response_format
+
+        # 查询结果缓存 {key: (过期时间, 结果文本)}，AI 多轮调用中常重复查询相同参数
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        # 不指定日期仍查询无数据的代码 -> 过期时间
+        self._bad_codes: Dict[str, float] = {}
+
+    @property
+    def token(self) -> str:
+        """Tushare Pro API Token"""
+        return self._token
+
+    @token.setter
+    def token(self, value: str) -> None:
+        """更换 Token 时重建 API 客户端并清空缓存（不同账号权限不同）"""
+        if value != self._token:
+            self._token = value
+            self._api = None
+            self.clear_cache()
+
+    def clear_cache(self) -> None:
+        """清空查询结果缓存"""
+        with self._cache_lock:
+            self._cache.clear()
+        self._bad_codes.clear()
+
+    def _cache_key(self, function_name: str, arguments: Dict[str, Any]) -> str:
+        """根据函数名、参数（以及非默认的输出格式）计算缓存键"""
+        payload = function_name.encode("utf-8") + _json_dumps(arguments, sort_keys=True)
+        if self.response_format != "text":
+            payload += self.response_format.encode("utf-8")
+        return hashlib.md5(payload).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        """读取未过期的缓存结果"""
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return entry[1]
+
+    def _cache_set(self, key: str, function_name: str, arguments: Dict[str, Any], result: str) -> None:
+        """写入缓存（错误提示不缓存）"""
+        trade_date = arguments.get("trade_date")
+        if trade_date and trade_date < time.strftime("%Y%m%d"):
+            ttl = HISTORY_TOOL_CACHE_TTL
+        else:
+            ttl = TOOL_CACHE_TTL.get(function_name, 0)
+        if ttl <= 0 or result.startswith("错误"):
+            return
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic() + ttl, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > TOOL_CACHE_MAX_SIZE:
+                self._cache.popitem(last=False)
+
+    def _cached_result(self, key: str, function_name: str, arguments: Dict[str, Any]) -> Optional[str]:
+        """依次查找内存缓存与磁盘缓存，磁盘命中时回填内存缓存"""
+        cached = self._cache_get(key)
+        if cached is None and self._disk_cache is not None:
+            cached = self._disk_cache.get(key)
+            if cached is not None:
+                self._cache_set(key, function_name, arguments, cached)
+        return cached
+
+    def _store_result(self, key: str, function_name: str, arguments: Dict[str, Any], result: str) -> None:
+        """写入内存缓存与磁盘缓存（磁盘缓存跳过无数据与错误结果）"""
+        self._cache_set(key, function_name, arguments, result)
+        if self._disk_cache is None or result.startswith(("错误", "未查询到")):
+            return
+        trade_date = arguments.get("trade_date")
+        if trade_date and trade_date < time.strftime("%Y%m%d"):
+            ttl = DISK_CACHE_HISTORY_TTL
+        else:
+            ttl = DISK_CACHE_TODAY_TTL
+        self._disk_cache.put(key, result, ttl)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """返回查询结果缓存的命中统计"""
+        total = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "size": len(self._cache),
+            "hit_rate": self.cache_hits / total if total else 0.0,
+        }
 
     @property
     def api(self):
-        """延迟初始化 tushare pro_api（避免未安装 tushare 时报错）。"""
+        """延迟初始化 tushare pro_api（避免未安装 tushare 时报错），同一 Token 在进程内共享。"""
         if self._api is None:
-            import tushare as ts
-            self._api = ts.pro_api(self.token)
+            with self._api_cache_lock:
+                api = self._api_cache.get(self.token)
+                if api is None:
+                    import tushare as ts
+                    api = ts.pro_api(self.token)
+                    _install_tushare_session()
+                    self._api_cache[self.token] = api
+            self._api = api
         return self._api
 
+    def warmup(self) -> None:
+        """
+        在后台线程预热 API 客户端与 HTTPS 连接（应在 validate() 通过后调用）。
+
+        首次工具调用通常发生在 AI 第一轮响应之后，提前预热可消除首次调用的初始化与握手延迟。
+        """
+        threading.Thread(target=self._warmup, name="tushare-warmup", daemon=True).start()
+
+    def _warmup(self) -> None:
+        """后台预热：初始化 pro_api，并发起一次轻量查询在共享连接池中建立 TLS 连接。"""
+        try:
+            today = time.strftime("%Y%m%d")
+            # 经 _call_api 发出，与其他请求共用限速与退避
+            self._call_api("trade_cal", {"exchange": "SSE", "start_date": today, "end_date": today})
+        except Exception:
+            # 预热失败不影响正常调用，首次工具调用时会再次初始化并给出错误信息
+            pass
+
+    def prefetch(self, symbols: Optional[List[str]] = None) -> None:
+        """
+        在后台线程池中预取几乎每次分析都会用到的查询，结果写入查询缓存，模型首次调用时可直接命中。
+
+        分析提示词要求模型查询“前一交易日”的指数与涨跌停数据，调用时会带上该日期，
+        因此这里先通过交易日历解析出前一交易日，用与模型调用完全相同的参数预取：
+        指数日线（带日期，以及不带日期的近期走势）和前一交易日涨跌停。
+
+        Args:
+            symbols: 预取的指数代码，默认 HOT_INDEX_CODES
+        """
+        threading.Thread(
+            target=self._prefetch, args=(list(symbols or HOT_INDEX_CODES),),
+            name="tushare-prefetch", daemon=True,
+        ).start()
+
+    def _prefetch(self, codes: List[str]) -> None:
+        """后台执行预取：先解析前一交易日，再用线程池并发执行各查询"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        calls = [("get_index_daily", {"ts_code": code}) for code in codes]
+        trade_date = self._previous_trade_date()
+        if trade_date:
+            calls += [("get_index_daily", {"ts_code": code, "trade_date": trade_date}) for code in codes]
+            calls.append(("get_limit_list", {"trade_date": trade_date}))
+
+        with ThreadPoolExecutor(max_workers=4, thread_name_prefix="tushare-prefetch") as pool:
+            for name, args in calls:
+                # 预取失败时 stream_execute 返回错误文本且不写入磁盘缓存，不影响之后的正常调用
+                pool.submit(lambda n=name, a=args: "".join(self.stream_execute(n, a)))
+
+    def _previous_trade_date(self) -> str:
+        """通过交易日历获取今天之前的最近一个交易日（YYYYMMDD），查询失败时返回空字符串"""
+        today = time.strftime("%Y%m%d")
+        try:
+            df = self._call_api(
+                "trade_cal",
+                {"exchange": "SSE", "start_date": today, "end_date": today, "fields": "cal_date,pretrade_date"},
+            )
+        except Exception:
+            return ""
+        if df is None or len(df.index) == 0 or "pretrade_date" not in df.columns:
+            return ""
+        return str(df["pretrade_date"].iloc[0] or "")
+
+    def _query(self, api_name: str, **params):
+        """
+        调用 Tushare 接口，启用数据缓存时优先读取未过期的本地 parquet 文件。
+
+        缓存的是接口返回的原始 DataFrame（而非格式化文本），命中后仍走正常的格式化流程。
+
+        Args:
+            api_name: Tushare 接口名（如 daily、ths_member）
+            **params: 接口参数（含 fields、limit）
+
+        Returns:
+            接口返回的 DataFrame
+        """
+        path = self._data_cache_path(api_name, params)
+        if path is not None:
+            df = self._read_data_cache(path, self._data_cache_ttl(api_name, params))
+            if df is not None:
+                return df
+
+        df = self._call_api(api_name, params)
+
+        if path is not None and df is not None and len(df.index) > 0:
+            self._write_data_cache(path, df)
+        return df
+
+    def _call_api(self, api_name: str, params: Dict[str, Any]):
+        """
+        发起实际的 Tushare 请求：先经过令牌桶限速，触发频率限制时按指数退避（带抖动）重试。
+
+        避免并发的工具调用集中触发限流后，把错误直接返回给模型导致其立即重试。
+        """
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire()
+            try:
+                return self._request(api_name, params)
+            except Exception as e:
+                if attempt >= RATE_LIMIT_MAX_RETRIES or _RATE_LIMIT_MESSAGE not in str(e):
+                    raise
+                delay = min(
+                    RATE_LIMIT_BACKOFF_MAX,
+                    RATE_LIMIT_BACKOFF_BASE * (2 ** attempt) * (1 + random.random()),
+                )
+                print(f"[AI] Tushare {api_name} 触发频率限制，{delay:.1f} 秒后重试")
+                time.sleep(delay)
+
+    def _request(self, api_name: str, params: Dict[str, Any]):
+        """通过 tushare pro_api 发起单次请求（子类可替换传输方式）"""
+        return getattr(self.api, api_name)(**params)
+
+    def _data_cache_path(self, api_name: str, params: Dict[str, Any]) -> Optional[Path]:
+        """计算缓存文件路径：{cache_dir}/{接口名}/{参数哈希}.parquet"""
+        if self.cache_dir is None or not _parquet_available():
+            return None
+        digest = hashlib.md5(_json_dumps(params, sort_keys=True)).hexdigest()
+        return self.cache_dir / api_name / f"{digest}.parquet"
+
+    @staticmethod
+    def _data_cache_ttl(api_name: str, params: Dict[str, Any]) -> int:
+        """历史交易日数据使用长有效期，其余按接口配置"""
+        trade_date = params.get("trade_date")
+        if trade_date and trade_date < time.strftime("%Y%m%d"):
+            return HISTORY_DATA_CACHE_TTL
+        return DATA_CACHE_TTL.get(api_name, DATA_CACHE_DEFAULT_TTL)
+
+    @staticmethod
+    def _read_data_cache(path: Path, ttl: int):
+        """读取未过期的缓存文件，不存在、过期或损坏时返回 None"""
+        try:
+            if time.time() - path.stat().st_mtime > ttl:
+                return None
+            import pandas as pd
+            return pd.read_parquet(path)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _write_data_cache(path: Path, df) -> None:
+        """写入缓存文件（先写临时文件再替换，避免并发读到半个文件）；失败时忽略"""
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except Exception:
+            pass
+
     def execute(self, function_name: str, arguments: Dict[str, Any]) -> str:
         """
         统一分发工具调用，捕获异常并返回友好错误信息。
 
+        相同函数与参数的查询结果在有效期内直接从缓存返回。
+
         Args:
             function_name: 工具函数名
-            arguments: 函数参数字典
+            arguments: 函数参数字典，也可直接传入模型返回的原始 JSON 字符串
 
         Returns:
             str: 格式化的文本结果
         """
-        dispatch = {
-            "get_concept_sector_daily": self.get_concept_sector_daily,
-            "get_concept_sector_members": self.get_concept_sector_members,
-            "get_index_daily": self.get_index_daily,
-            "get_stock_daily_basic": self.get_stock_daily_basic,
-            "get_stock_daily": self.get_stock_daily,
-            "get_limit_list": self.get_limit_list,
-            "get_top_list": self.get_top_list,
-            "get_moneyflow": self.get_moneyflow,
-        }
+        return "".join(self.stream_execute(function_name, arguments))
 
-        func = dispatch.get(function_name)
-        if not func:
-            return f"错误：未知的工具函数 '{function_name}'"
+    def stream_execute(self, function_name: str, arguments: Dict[str, Any]) -> Iterator[str]:
+        """
+        分块产出工具调用结果，调用方可以边生成边消费（如逐块写入输出）。
+
+        表格类工具先产出表头，再按行块产出；其余工具、缓存命中和错误信息整体产出一次。
+        参数校验、缓存与错误处理与 execute 相同。
+
+        Args:
+            function_name: 工具函数名
+            arguments: 函数参数字典，也可直接传入模型返回的原始 JSON 字符串
 
+        Yields:
+            str: 结果文本片段，依次拼接即为完整结果
+        """
+        if isinstance(arguments, (str, bytes)):
+            try:
+                arguments = _json_loads(arguments or "{}")
+            except ValueError:
+                yield f"错误：工具参数不是合法的 JSON：{arguments!r}"
+                return
+        if not isinstance(arguments, dict):
+            yield "错误：工具参数必须是 JSON 对象"
+            return
+
+        func = self._DISPATCH.get(function_name)
+        if not func:
+            yield f"错误：未知的工具函数 '{function_name}'"
+            return
+
+        error = _validate_args(function_name, arguments)
+        if error:
+            yield error
+            return
+
+        cache_key = self._cache_key(function_name, arguments)
+        cached = self._cached_result(cache_key, function_name, arguments)
+        if cached is not None:
+            self.cache_hits += 1
+            yield cached
+            return
+        self.cache_misses += 1
+
+        # 仅拦截同样不指定日期的查询；指定日期的查询（如停牌前的交易日）照常执行
+        ts_code = arguments.get("ts_code")
+        check_code = function_name in _CODE_CHECK_TOOLS and not arguments.get("trade_date")
+        if check_code and self._bad_codes.get(ts_code, 0) > time.monotonic():
+            yield f"错误：{ts_code} 最近查询均无数据，请确认代码是否正确，不要重复查询。"
+            return
+
+        stream = getattr(func, "stream", None)
+        chunks: List[str] = []
         try:
-            return func(**arguments)
+            if stream is None:
+                chunks.append(func(self, **arguments))
+                yield chunks[0]
+            else:
+                # 查询在产出第一块之前完成，查询失败时不会产出不完整的结果
+                for chunk in stream(self, **arguments):
+                    chunks.append(chunk)
+                    yield chunk
         except ImportError:
-            return "错误：tushare 未安装，请先安装：pip install tushare"
+            yield "错误：tushare 未安装，请先安装：pip install tushare"
+            return
         except Exception as e:
             error_type = type(e).__name__
             error_msg = str(e)
+            if _RATE_LIMIT_MESSAGE in error_msg:
+                # 已在 _call_api 中退避重试，仍失败时明确告知模型不要立即重复调用
+                yield f"错误：Tushare 接口访问频率已达上限（已自动重试 {RATE_LIMIT_MAX_RETRIES} 次），请基于已有数据继续分析，不要立即重复调用。"
+                return
             if len(error_msg) > 200:
                 error_msg = error_msg[:200] + "..."
-            return f"Tushare 查询失败 ({error_type}): {error_msg}"
+            yield f"Tushare 查询失败 ({error_type}): {error_msg}"
+            return
+
+        result = "".join(chunks)
+        self._store_result(cache_key, function_name, arguments, result)
+        # 未指定日期仍查不到数据，基本可以确定代码有误
+        if check_code and result.startswith("未查询到"):
+            self._bad_codes[ts_code] = time.monotonic() + BAD_CODE_TTL
+
+    async def execute_async(self, function_name: str, arguments: Dict[str, Any]) -> str:
+        """
+        异步执行工具调用（阻塞的 Tushare 请求放到线程中执行）。
 
+        Args:
+            function_name: 工具函数名
+            arguments: 函数参数字典
+
+        Returns:
+            str: 格式化的文本结果
+        """
+        return await asyncio.to_thread(self.execute, function_name, arguments)
+
+    async def execute_batch(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """
+        并发执行一组工具调用，总耗时约等于最慢的一次查询。
+
+        Args:
+            calls: [(function_name, arguments), ...]
+
+        Returns:
+            List[str]: 与输入顺序一致的结果文本
+        """
+        results = await asyncio.gather(
+            *(self.execute_async(name, args) for name, args in calls),
+            return_exceptions=True,
+        )
+        return [
+            r if isinstance(r, str) else f"Tushare 查询失败 ({type(r).__name__}): {r}"
+            for r in results
+        ]
+
+    def execute_many(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """
+        批量执行工具调用的同步入口，供 AIClient.chat_with_tools 的批量工具回调使用。
+
+        同一交易日对多只股票/指数的日线/每日指标/资金流向查询会合并为一次请求
+        （ts_code 逗号分隔），其余调用并发执行。
+
+        Args:
+            calls: [(function_name, arguments), ...]
+
+        Returns:
+            List[str]: 与输入顺序一致的结果文本
+        """
+        return asyncio.run(self._execute_coalesced(calls))
+
+    async def _execute_coalesced(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """按 (工具名, 交易日) 合并可批量的调用，与其余调用一起并发执行"""
+        groups: Dict[tuple, List[int]] = {}
+        for i, (name, args) in enumerate(calls):
+            key = self._coalesce_key(name, args)
+            if key is not None:
+                groups.setdefault(key, []).append(i)
+        merged = [indices for indices in groups.values() if len(indices) > 1]
+        merged_set = {i for indices in merged for i in indices}
+        single = [i for i in range(len(calls)) if i not in merged_set]
+
+        results: List[str] = [""] * len(calls)
+
+        async def run(indices: List[int], batch) -> None:
+            texts = await batch([calls[i] for i in indices])
+            for i, text in zip(indices, texts):
+                results[i] = text
+
+        await asyncio.gather(
+            run(single, self.execute_batch),
+            *(run(indices, self._execute_merged_async) for indices in merged),
+        )
+        return results
+
+    def _coalesce_key(self, function_name: str, arguments: Dict[str, Any]) -> Optional[tuple]:
+        """可合并的调用返回分组键 (工具名, 交易日)，否则返回 None"""
+        if function_name not in _MULTI_CODE_TOOLS or not isinstance(arguments, dict):
+            return None
+        ts_code = arguments.get("ts_code")
+        trade_date = arguments.get("trade_date")
+        # 未指定交易日时每只股票返回多行，无法用单次查询的行数限制覆盖
+        if set(arguments) - {"ts_code", "trade_date"} or not trade_date:
+            return None
+        if not isinstance(ts_code, str) or not ts_code or "," in ts_code:
+            return None
+        # 非法参数不参与合并，由 stream_execute 逐个给出错误信息
+        if _validate_args(function_name, arguments) is not None:
+            return None
+        if self._cached_result(self._cache_key(function_name, arguments), function_name, arguments) is not None:
+            return None
+        return function_name, trade_date
+
+    async def _execute_merged_async(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        return await asyncio.to_thread(self._execute_merged, calls)
+
+    def _execute_merged(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """将同一工具、同一交易日的多个代码查询合并为一次请求，再按 ts_code 拆分格式化"""
+        function_name, first_args = calls[0]
+        api_name, fields, formatter = _MULTI_CODE_TOOLS[function_name]
+        codes = list(dict.fromkeys(args["ts_code"] for _, args in calls))
+        try:
+            df = self._query(
+                api_name,
+                ts_code=",".join(codes),
+                trade_date=first_args["trade_date"],
+                fields="ts_code," + fields,
+                # 指定交易日时每个代码至多一行
+                limit=len(codes),
+            )
+        except Exception:
+            # 合并查询失败时逐个执行，由 execute 给出各自的错误信息
+            return ["".join(self.stream_execute(name, args)) for name, args in calls]
+
+        results = []
+        for name, args in calls:
+            code = args["ts_code"]
+            sub = None
+            if df is not None and len(df.index) > 0:
+                # 去掉合并查询额外请求的 ts_code 列，与单独查询的结果字段一致
+                sub = df[df["ts_code"] == code].drop(columns="ts_code")
+            if sub is None or len(sub.index) == 0:
+                # 合并结果中缺少该代码（部分接口会忽略多代码中的一部分）：单独查询确认，
+                # 不把合并查询的空结果当作"无数据"缓存
+                results.append("".join(self.stream_execute(name, args)))
+                continue
+            try:
+                text = getattr(self, formatter)(code, sub)
+            except Exception:
+                results.append("".join(self.stream_execute(name, args)))
+                continue
+            self.cache_misses += 1
+            self._store_result(self._cache_key(name, args), name, args, text)
+            results.append(text)
+        return results
+
+    @_streamed
     def get_concept_sector_daily(
         self,
         ts_code: str = "",
         trade_date: str = "",
-    ) -> str:
+    ) -> Iterator[str]:
         """
         获取同花顺概念板块日线行情。
 
@@ -282,8 +1098,8 @@ class TushareToolExecutor:
             ts_code: 板块代码（如 885311.TI）
             trade_date: 交易日期（YYYYMMDD）
 
-        Returns:
-            格式化的行情文本
+        Yields:
+            格式化的行情文本片段
         """
         params = {}
         fields = "ts_code,trade_date,open,close,high,low,pct_change,vol,turnover_rate"
@@ -295,54 +1111,62 @@ class TushareToolExecutor:
 
         # 如果既没有 ts_code 也没有 trade_date，无法查询
         if not params:
-            return "错误：请至少提供板块代码（ts_code）或交易日期（trade_date）之一。"
-
-        df = self.api.ths_daily(**params, fields=fields)
-
-        if df is None or df.empty:
-            return f"未查询到数据（ts_code={ts_code}, trade_date={trade_date}）。可能是非交易日或代码有误。"
-
-        # 限制返回行数，避免返回过多数据
-        df = df.head(20)
-
-        lines = [f"同花顺概念板块日线行情（共 {len(df)} 条）："]
-        lines.append("板块代码 | 交易日 | 开盘 | 收盘 | 最高 | 最低 | 涨跌幅(%) | 成交量 | 换手率(%)")
-        lines.append("-" * 80)
-        for _, row in df.iterrows():
-            pct = f"{row.get('pct_change', 0):.2f}" if row.get("pct_change") is not None else "-"
-            vol = f"{row.get('vol', 0):.0f}" if row.get("vol") is not None else "-"
-            tr = f"{row.get('turnover_rate', 0):.2f}" if row.get("turnover_rate") is not None else "-"
-            lines.append(
-                f"{row.get('ts_code', '-')} | {row.get('trade_date', '-')} | "
-                f"{row.get('open', '-')} | {row.get('close', '-')} | "
-                f"{row.get('high', '-')} | {row.get('low', '-')} | "
-                f"{pct} | {vol} | {tr}"
-            )
-
-        return "\n".join(lines)
+            yield "错误：请至少提供板块代码（ts_code）或交易日期（trade_date）之一。"
+            return
+
+        df = self._query("ths_daily", **params, fields=fields, limit=20)
+
+        if df is None or len(df.index) == 0:
+            yield f"未查询到数据（ts_code={ts_code}, trade_date={trade_date}）。可能是非交易日或代码有误。"
+            return
+
+        # 服务端已按 limit 截断，这里兜底限制返回行数
+        df = _truncate(df, 20)
+
+        title = f"同花顺概念板块日线行情（共 {len(df)} 条）："
+        if self.response_format == "json":
+            yield _records_json(title, df)
+            return
+
+        yield from _iter_table(
+            title,
+            _SECTOR_DAILY_HEADER,
+            [
+                _text_col(df, "ts_code"), _text_col(df, "trade_date"),
+                _text_col(df, "open"), _text_col(df, "close"),
+                _text_col(df, "high"), _text_col(df, "low"),
+                _num_col(df, "pct_change", ".2f"), _num_col(df, "vol", ".0f"),
+                _num_col(df, "turnover_rate", ".2f"),
+            ],
+        )
 
-    def get_concept_sector_members(self, ts_code: str) -> str:
+    @_streamed
+    def get_concept_sector_members(self, ts_code: str) -> Iterator[str]:
         """
         获取同花顺概念板块成分股列表。
 
         Args:
             ts_code: 板块代码（如 885311.TI）
 
-        Returns:
-            格式化的成分股列表文本
+        Yields:
+            格式化的成分股列表文本片段
         """
-        df = self.api.ths_member(ts_code=ts_code)
+        df = self._query("ths_member", ts_code=ts_code, fields="con_code,con_name")
 
-        if df is None or df.empty:
-            return f"未查询到板块 {ts_code} 的成分股数据。请检查板块代码是否正确。"
+        if df is None or len(df.index) == 0:
+            yield f"未查询到板块 {ts_code} 的成分股数据。请检查板块代码是否正确。"
+            return
 
-        lines = [f"板块 {ts_code} 成分股列表（共 {len(df)} 只）："]
-        lines.append("股票代码 | 股票名称")
-        lines.append("-" * 40)
-        for _, row in df.iterrows():
-            lines.append(f"{row.get('con_code', '-')} | {row.get('con_name', '-')}")
+        title = f"板块 {ts_code} 成分股列表（共 {len(df)} 只）："
+        if self.response_format == "json":
+            yield _records_json(title, df)
+            return
 
-        return "\n".join(lines)
+        yield from _iter_table(
+            title,
+            _SECTOR_MEMBERS_HEADER,
+            [_text_col(df, "con_code"), _text_col(df, "con_name")],
+        )
 
     def get_index_daily(
         self,
@@ -363,30 +1187,32 @@ class TushareToolExecutor:
         if trade_date:
             params["trade_date"] = trade_date
 
-        df = self.api.index_daily(**params)
+        df = self._query("index_daily", **params, fields=_INDEX_DAILY_FIELDS, limit=10)
+        return self._format_index_daily(ts_code, df)
 
-        if df is None or df.empty:
+    def _format_index_daily(self, ts_code: str, df) -> str:
+        """将指数日线行情 DataFrame 格式化为文本。"""
+        if df is None or len(df.index) == 0:
             return f"未查询到指数 {ts_code} 的行情数据。可能是非交易日或代码有误。"
 
-        # 限制返回行数
-        df = df.head(10)
-
-        lines = [f"指数 {ts_code} 日线行情（共 {len(df)} 条）："]
-        lines.append("交易日 | 开盘 | 收盘 | 最高 | 最低 | 涨跌点 | 涨跌幅(%) | 成交量(手) | 成交额(千元)")
-        lines.append("-" * 100)
-        for _, row in df.iterrows():
-            pct = f"{row.get('pct_chg', 0):.2f}" if row.get("pct_chg") is not None else "-"
-            change = f"{row.get('change', 0):.2f}" if row.get("change") is not None else "-"
-            vol = f"{row.get('vol', 0):.0f}" if row.get("vol") is not None else "-"
-            amount = f"{row.get('amount', 0):.0f}" if row.get("amount") is not None else "-"
-            lines.append(
-                f"{row.get('trade_date', '-')} | "
-                f"{row.get('open', '-')} | {row.get('close', '-')} | "
-                f"{row.get('high', '-')} | {row.get('low', '-')} | "
-                f"{change} | {pct} | {vol} | {amount}"
-            )
-
-        return "\n".join(lines)
+        # 服务端已按 limit 截断，这里兜底限制返回行数
+        df = _truncate(df, 10)
+
+        title = f"指数 {ts_code} 日线行情（共 {len(df)} 条）："
+        if self.response_format == "json":
+            return _records_json(title, df)
+
+        return "".join(_iter_table(
+            title,
+            _INDEX_DAILY_HEADER,
+            [
+                _text_col(df, "trade_date"),
+                _text_col(df, "open"), _text_col(df, "close"),
+                _text_col(df, "high"), _text_col(df, "low"),
+                _num_col(df, "change", ".2f"), _num_col(df, "pct_chg", ".2f"),
+                _num_col(df, "vol", ".0f"), _num_col(df, "amount", ".0f"),
+            ],
+        ))
 
     def get_stock_daily_basic(
         self,
@@ -404,42 +1230,31 @@ class TushareToolExecutor:
             格式化的个股指标文本
         """
         params = {"ts_code": ts_code}
-        fields = (
-            "ts_code,trade_date,close,turnover_rate,turnover_rate_f,"
-            "volume_ratio,pe,pe_ttm,pb,ps,ps_ttm,"
-            "dv_ratio,dv_ttm,total_share,float_share,free_share,"
-            "total_mv,circ_mv"
-        )
         if trade_date:
             params["trade_date"] = trade_date
 
-        df = self.api.daily_basic(**params, fields=fields)
+        df = self._query("daily_basic", **params, fields=_DAILY_BASIC_FIELDS, limit=5)
+        return self._format_stock_daily_basic(ts_code, df)
 
-        if df is None or df.empty:
+    def _format_stock_daily_basic(self, ts_code: str, df) -> str:
+        """将个股每日指标 DataFrame 格式化为文本。"""
+        if df is None or len(df.index) == 0:
             return f"未查询到股票 {ts_code} 的每日指标数据。可能是非交易日或代码有误。"
 
-        # 限制返回行数
-        df = df.head(5)
-
-        lines = [f"股票 {ts_code} 每日指标（共 {len(df)} 条）："]
-        for _, row in df.iterrows():
-            td = row.get("trade_date", "-")
-            lines.append(f"\n--- {td} ---")
-            lines.append(f"收盘价: {row.get('close', '-')}")
-            lines.append(f"换手率: {self._fmt(row.get('turnover_rate'))}%")
-            lines.append(f"换手率(自由流通): {self._fmt(row.get('turnover_rate_f'))}%")
-            lines.append(f"量比: {self._fmt(row.get('volume_ratio'))}")
-            lines.append(f"市盈率(PE): {self._fmt(row.get('pe'))}")
-            lines.append(f"市盈率(PE_TTM): {self._fmt(row.get('pe_ttm'))}")
-            lines.append(f"市净率(PB): {self._fmt(row.get('pb'))}")
-            lines.append(f"市销率(PS): {self._fmt(row.get('ps'))}")
-            lines.append(f"股息率: {self._fmt(row.get('dv_ratio'))}%")
-            total_mv = row.get("total_mv")
-            circ_mv = row.get("circ_mv")
-            lines.append(f"总市值: {self._fmt_mv(total_mv)}")
-            lines.append(f"流通市值: {self._fmt_mv(circ_mv)}")
-
-        return "\n".join(lines)
+        df = _truncate(df, 5)
+
+        title = f"股票 {ts_code} 每日指标（共 {len(df)} 条）："
+        if self.response_format == "json":
+            return _records_json(title, df)
+
+        # 各列整列格式化后按行套用模板，避免逐行逐字段拼接
+        blocks = map(
+            _DAILY_BASIC_BLOCK.format,
+            _text_col(df, "trade_date"), _text_col(df, "close"),
+            *(_num_col(df, col, ".2f") for col in _DAILY_BASIC_RATIO_COLS),
+            _mv_col(df, "total_mv"), _mv_col(df, "circ_mv"),
+        )
+        return title + "".join(blocks)
 
     def get_stock_daily(
         self,
@@ -460,36 +1275,38 @@ class TushareToolExecutor:
         if trade_date:
             params["trade_date"] = trade_date
 
-        df = self.api.daily(**params)
+        df = self._query("daily", **params, fields=_DAILY_FIELDS, limit=10)
+        return self._format_stock_daily(ts_code, df)
 
-        if df is None or df.empty:
+    def _format_stock_daily(self, ts_code: str, df) -> str:
+        """将个股日线行情 DataFrame 格式化为文本。"""
+        if df is None or len(df.index) == 0:
             return f"未查询到股票 {ts_code} 的日线行情数据。可能是非交易日或代码有误。"
 
-        df = df.head(10)
-
-        lines = [f"股票 {ts_code} 日线行情（共 {len(df)} 条）："]
-        lines.append("交易日 | 开盘 | 收盘 | 最高 | 最低 | 昨收 | 涨跌幅(%) | 成交量(手) | 成交额(千元)")
-        lines.append("-" * 100)
-        for _, row in df.iterrows():
-            pct = f"{row.get('pct_chg', 0):.2f}" if row.get("pct_chg") is not None else "-"
-            vol = f"{row.get('vol', 0):.0f}" if row.get("vol") is not None else "-"
-            amount = f"{row.get('amount', 0):.0f}" if row.get("amount") is not None else "-"
-            lines.append(
-                f"{row.get('trade_date', '-')} | "
-                f"{row.get('open', '-')} | {row.get('close', '-')} | "
-                f"{row.get('high', '-')} | {row.get('low', '-')} | "
-                f"{row.get('pre_close', '-')} | "
-                f"{pct} | {vol} | {amount}"
-            )
+        # 服务端已按 limit 截断，这里兜底限制返回行数
+        df = _truncate(df, 10)
+
+        title = f"股票 {ts_code} 日线行情（共 {len(df)} 条）："
+        if self.response_format == "json":
+            return _records_json(title, df)
 
-        return "\n".join(lines)
+        rows = _join_rows([
+            _text_col(df, "trade_date"),
+            _text_col(df, "open"), _text_col(df, "close"),
+            _text_col(df, "high"), _text_col(df, "low"),
+            _text_col(df, "pre_close"),
+            _num_col(df, "pct_chg", ".2f"),
+            _num_col(df, "vol", ".0f"), _num_col(df, "amount", ".0f"),
+        ])
+        return f"{title}\n{_STOCK_DAILY_HEADER}\n{rows}"
 
+    @_streamed
     def get_limit_list(
         self,
         trade_date: str = "",
         limit_type: str = "",
         ts_code: str = "",
-    ) -> str:
+    ) -> Iterator[str]:
         """
         获取每日涨跌停统计。
 
@@ -498,8 +1315,8 @@ class TushareToolExecutor:
             limit_type: U=涨停, D=跌停, Z=炸板
             ts_code: 股票代码（可选，筛选单只股票）
 
-        Returns:
-            格式化的涨跌停列表文本
+        Yields:
+            格式化的涨跌停列表文本片段
         """
         params = {}
         if trade_date:
@@ -510,45 +1327,44 @@ class TushareToolExecutor:
             params["ts_code"] = ts_code
 
         if not params:
-            return "错误：请至少提供交易日期（trade_date）或股票代码（ts_code）之一。"
+            yield "错误：请至少提供交易日期（trade_date）或股票代码（ts_code）之一。"
+            return
 
         fields = (
-            "ts_code,trade_date,name,close,pct_chg,amp,"
-            "fc_ratio,fl_ratio,fd_amount,first_time,last_time,"
-            "open_times,strth,limit"
+            "ts_code,name,close,pct_chg,fc_ratio,fd_amount,"
+            "first_time,open_times,strth,limit"
+        )
+        df = self._query("limit_list_d", **params, fields=fields, limit=50)
+
+        if df is None or len(df.index) == 0:
+            yield f"未查询到涨跌停数据（trade_date={trade_date}, limit_type={limit_type}）。可能是非交易日。"
+            return
+
+        df = _truncate(df, 50)
+
+        title = f"涨跌停统计（共 {len(df)} 条）："
+        if self.response_format == "json":
+            yield _records_json(title, df)
+            return
+
+        yield from _iter_table(
+            title,
+            _LIMIT_LIST_HEADER,
+            [
+                _text_col(df, "ts_code"), _text_col(df, "name"),
+                _text_col(df, "close"), _num_col(df, "pct_chg", ".2f"),
+                _num_col(df, "fc_ratio", ".2f"), _num_col(df, "fd_amount", ".0f"),
+                _text_col(df, "first_time"), _text_col(df, "open_times"),
+                _num_col(df, "strth", ".1f"), [_LIMIT_LABELS.get(v, v) for v in _text_col(df, "limit")],
+            ],
         )
-        df = self.api.limit_list_d(**params, fields=fields)
-
-        if df is None or df.empty:
-            return f"未查询到涨跌停数据（trade_date={trade_date}, limit_type={limit_type}）。可能是非交易日。"
-
-        df = df.head(50)
-
-        limit_label = {"U": "涨停", "D": "跌停", "Z": "炸板"}
-        lines = [f"涨跌停统计（共 {len(df)} 条）："]
-        lines.append("代码 | 名称 | 收盘 | 涨跌幅(%) | 封单比 | 封单额(万) | 首封时间 | 开板次数 | 强度 | 类型")
-        lines.append("-" * 110)
-        for _, row in df.iterrows():
-            pct = f"{row.get('pct_chg', 0):.2f}" if row.get("pct_chg") is not None else "-"
-            fc = f"{row.get('fc_ratio', 0):.2f}" if row.get("fc_ratio") is not None else "-"
-            fd = f"{row.get('fd_amount', 0):.0f}" if row.get("fd_amount") is not None else "-"
-            ft = row.get("first_time", "-") or "-"
-            ot = row.get("open_times", "-")
-            strth = f"{row.get('strth', 0):.1f}" if row.get("strth") is not None else "-"
-            lt = limit_label.get(row.get("limit", ""), row.get("limit", "-"))
-            lines.append(
-                f"{row.get('ts_code', '-')} | {row.get('name', '-')} | "
-                f"{row.get('close', '-')} | {pct} | {fc} | {fd} | "
-                f"{ft} | {ot} | {strth} | {lt}"
-            )
-
-        return "\n".join(lines)
 
+    @_streamed
     def get_top_list(
         self,
         trade_date: str = "",
         ts_code: str = "",
-    ) -> str:
+    ) -> Iterator[str]:
         """
         获取龙虎榜每日明细。
 
@@ -556,8 +1372,8 @@ class TushareToolExecutor:
             trade_date: 交易日期（YYYYMMDD）
             ts_code: 股票代码（可选）
 
-        Returns:
-            格式化的龙虎榜文本
+        Yields:
+            格式化的龙虎榜文本片段
         """
         params = {}
         if trade_date:
@@ -566,41 +1382,39 @@ class TushareToolExecutor:
             params["ts_code"] = ts_code
 
         if not params:
-            return "错误：请至少提供交易日期（trade_date）或股票代码（ts_code）之一。"
+            yield "错误：请至少提供交易日期（trade_date）或股票代码（ts_code）之一。"
+            return
 
         fields = (
-            "ts_code,trade_date,name,close,pct_change,turnover_rate,"
-            "amount,l_sell,l_buy,l_amount,net_amount,net_rate,amount_rate,"
-            "float_values,reason"
+            "ts_code,name,close,pct_change,l_buy,l_sell,"
+            "net_amount,net_rate,amount_rate,reason"
         )
-        df = self.api.top_list(**params, fields=fields)
-
-        if df is None or df.empty:
-            return f"未查询到龙虎榜数据（trade_date={trade_date}, ts_code={ts_code}）。可能是非交易日或当日无龙虎榜。"
-
-        df = df.head(30)
-
-        lines = [f"龙虎榜明细（共 {len(df)} 条）："]
-        lines.append(
-            "代码 | 名称 | 收盘 | 涨跌幅(%) | 龙虎榜买入(万) | 龙虎榜卖出(万) | "
-            "龙虎榜净买入(万) | 净买入占比(%) | 成交额占比(%) | 上榜原因"
+        df = self._query("top_list", **params, fields=fields, limit=30)
+
+        if df is None or len(df.index) == 0:
+            yield f"未查询到龙虎榜数据（trade_date={trade_date}, ts_code={ts_code}）。可能是非交易日或当日无龙虎榜。"
+            return
+
+        df = _truncate(df, 30)
+
+        title = f"龙虎榜明细（共 {len(df)} 条）："
+        if self.response_format == "json":
+            yield _records_json(title, df)
+            return
+
+        amount_cols = [_fmt_amount_col(df[col]) for col in ("l_buy", "l_sell", "net_amount")]
+
+        yield from _iter_table(
+            title,
+            _TOP_LIST_HEADER,
+            [
+                _text_col(df, "ts_code"), _text_col(df, "name"),
+                _text_col(df, "close"), _num_col(df, "pct_change", ".2f"),
+                *amount_cols,
+                _num_col(df, "net_rate", ".2f"), _num_col(df, "amount_rate", ".2f"),
+                _text_col(df, "reason"),
+            ],
         )
-        lines.append("-" * 140)
-        for _, row in df.iterrows():
-            pct = f"{row.get('pct_change', 0):.2f}" if row.get("pct_change") is not None else "-"
-            l_buy = self._fmt_amount(row.get("l_buy"))
-            l_sell = self._fmt_amount(row.get("l_sell"))
-            net = self._fmt_amount(row.get("net_amount"))
-            net_rate = f"{row.get('net_rate', 0):.2f}" if row.get("net_rate") is not None else "-"
-            amt_rate = f"{row.get('amount_rate', 0):.2f}" if row.get("amount_rate") is not None else "-"
-            reason = row.get("reason", "-") or "-"
-            lines.append(
-                f"{row.get('ts_code', '-')} | {row.get('name', '-')} | "
-                f"{row.get('close', '-')} | {pct} | {l_buy} | {l_sell} | "
-                f"{net} | {net_rate} | {amt_rate} | {reason}"
-            )
-
-        return "\n".join(lines)
 
     def get_moneyflow(
         self,
@@ -621,95 +1435,325 @@ class TushareToolExecutor:
         if trade_date:
             params["trade_date"] = trade_date
 
-        fields = (
-            "ts_code,trade_date,"
-            "buy_sm_amount,sell_sm_amount,buy_md_amount,sell_md_amount,"
-            "buy_lg_amount,sell_lg_amount,buy_elg_amount,sell_elg_amount,"
-            "net_mf_amount"
-        )
-        df = self.api.moneyflow(**params, fields=fields)
+        df = self._query("moneyflow", **params, fields=_MONEYFLOW_FIELDS, limit=5)
+        return self._format_moneyflow(ts_code, df)
 
-        if df is None or df.empty:
+    def _format_moneyflow(self, ts_code: str, df) -> str:
+        """将个股资金流向 DataFrame 格式化为文本。"""
+        if df is None or len(df.index) == 0:
             return f"未查询到股票 {ts_code} 的资金流向数据。可能是非交易日或代码有误。"
 
-        df = df.head(5)
-
-        lines = [f"股票 {ts_code} 资金流向（共 {len(df)} 条，金额单位：万元）："]
-        for _, row in df.iterrows():
-            td = row.get("trade_date", "-")
-            lines.append(f"\n--- {td} ---")
-
-            buy_sm = row.get("buy_sm_amount") or 0
-            sell_sm = row.get("sell_sm_amount") or 0
-            buy_md = row.get("buy_md_amount") or 0
-            sell_md = row.get("sell_md_amount") or 0
-            buy_lg = row.get("buy_lg_amount") or 0
-            sell_lg = row.get("sell_lg_amount") or 0
-            buy_elg = row.get("buy_elg_amount") or 0
-            sell_elg = row.get("sell_elg_amount") or 0
-
-            net_sm = buy_sm - sell_sm
-            net_md = buy_md - sell_md
-            net_lg = buy_lg - sell_lg
-            net_elg = buy_elg - sell_elg
-            net_main = net_lg + net_elg
-
-            lines.append(f"小单: 买入 {self._fmt_amount(buy_sm)} / 卖出 {self._fmt_amount(sell_sm)} / 净额 {self._fmt_amount(net_sm)}")
-            lines.append(f"中单: 买入 {self._fmt_amount(buy_md)} / 卖出 {self._fmt_amount(sell_md)} / 净额 {self._fmt_amount(net_md)}")
-            lines.append(f"大单: 买入 {self._fmt_amount(buy_lg)} / 卖出 {self._fmt_amount(sell_lg)} / 净额 {self._fmt_amount(net_lg)}")
-            lines.append(f"特大单: 买入 {self._fmt_amount(buy_elg)} / 卖出 {self._fmt_amount(sell_elg)} / 净额 {self._fmt_amount(net_elg)}")
-            lines.append(f"主力净流入(大单+特大单): {self._fmt_amount(net_main)}")
-            lines.append(f"总净流入: {self._fmt_amount(row.get('net_mf_amount'))}")
-
-        return "\n".join(lines)
+        df = _truncate(df, 5)
+
+        title = f"股票 {ts_code} 资金流向（共 {len(df)} 条，金额单位：万元）："
+        if self.response_format == "json":
+            return _records_json(title, df)
+
+        import numpy as np
+
+        def amounts(col: str):
+            # 缺失的分档金额（空值或整列缺失）按 0 计算净额
+            if col not in df.columns:
+                return np.zeros(len(df.index))
+            return np.nan_to_num(df[col].to_numpy(dtype=float, na_value=np.nan))
+
+        # 整列计算各档买入/卖出/净额并格式化，按 _MONEYFLOW_BLOCK 的占位顺序排列各列
+        cols = [_text_col(df, "trade_date")]
+        net_main = 0.0
+        for key, _ in _MONEYFLOW_TIERS:
+            buy = amounts(f"buy_{key}_amount")
+            sell = amounts(f"sell_{key}_amount")
+            if key in ("lg", "elg"):
+                net_main = net_main + (buy - sell)
+            cols += [_fmt_amount_col(buy), _fmt_amount_col(sell), _fmt_amount_col(buy - sell)]
+        cols.append(_fmt_amount_col(net_main))
+        # 总净流入缺失时显示为 '-'
+        net_mf = df["net_mf_amount"] if "net_mf_amount" in df.columns else np.full(len(df.index), np.nan)
+        cols.append(_fmt_amount_col(net_mf))
+
+        blocks = map(_MONEYFLOW_BLOCK.format, *cols)
+        return title + "".join(blocks)
+
+    # 工具名 -> 处理函数（类定义时构建一次，execute 直接查表并传入 self，不为每个实例创建绑定方法）
+    _DISPATCH: Dict[str, Callable[..., str]] = {
+        "get_concept_sector_daily": get_concept_sector_daily,
+        "get_concept_sector_members": get_concept_sector_members,
+        "get_index_daily": get_index_daily,
+        "get_stock_daily_basic": get_stock_daily_basic,
+        "get_stock_daily": get_stock_daily,
+        "get_limit_list": get_limit_list,
+        "get_top_list": get_top_list,
+        "get_moneyflow": get_moneyflow,
+    }
 
-    @staticmethod
-    def _fmt_amount(value) -> str:
-        """格式化金额（万元），None 显示为 '-'。"""
-        if value is None:
-            return "-"
+    def validate(self) -> tuple:
+        """
+        验证 Tushare 配置是否有效。
+
+        Returns:
+            tuple: (是否有效, 错误信息)
+        """
+        if self.response_format not in ("text", "json"):
+            return False, f"不支持的工具结果格式: {self.response_format}（可选 text / json）"
+        if not self.token:
+            return False, "未配置 Tushare Token，请在 config.yaml 或环境变量 TUSHARE_TOKEN 中设置"
+        if not _tushare_available():
+            return False, "tushare 未安装，请先安装：pip install tushare"
+        return True, ""
+
+
+class BatchingTushareExecutor(TushareToolExecutor):
+    """
+    自动合并并发调用的 Tushare 工具执行器。
+
+    execute_async 收到可合并的调用（同一工具、同一交易日、单个 ts_code）时不立即请求，
+    而是在短暂的去抖窗口内收集同组的其他调用，窗口结束后合并为一次请求
+    （ts_code 逗号分隔），再把按 ts_code 拆分的结果分别返回给各调用方。
+    不支持多代码的接口仍逐个执行。
+    """
+
+    def __init__(self, token: str, batch_window: float = 0.02, **kwargs):
+        """
+        初始化合并执行器。
+
+        Args:
+            token: Tushare Pro API Token
+            batch_window: 去抖窗口（秒），窗口内到达的同组调用会被合并
+            **kwargs: 传给 TushareToolExecutor 的其余参数
+        """
+        super().__init__(token, **kwargs)
+        self.batch_window = batch_window
+        # 分组键 -> [(调用, Future), ...]，只在事件循环线程中访问
+        self._pending: Dict[tuple, List[Tuple[Tuple[str, Dict[str, Any]], asyncio.Future]]] = {}
+        # 进行中的 flush 任务（保留引用，避免任务在完成前被回收）
+        self._flush_tasks: set = set()
+
+    async def execute_async(self, function_name: str, arguments: Dict[str, Any]) -> str:
+        # 只有通过参数校验的调用才进入合并队列，其余由 stream_execute 逐个处理并给出错误信息
+        if not isinstance(arguments, dict) or _validate_args(function_name, arguments) is not None:
+            return await super().execute_async(function_name, arguments)
+        key = self._coalesce_key(function_name, arguments)
+        if key is None:
+            return await super().execute_async(function_name, arguments)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        group = self._pending.get(key)
+        if group is None:
+            group = self._pending[key] = []
+            loop.call_later(self.batch_window, self._start_flush, key)
+        group.append(((function_name, arguments), future))
+        return await future
+
+    def _start_flush(self, key: tuple) -> None:
+        """在事件循环中启动 flush 任务，并持有其引用直到完成"""
+        task = asyncio.ensure_future(self._flush(key))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task: "asyncio.Task") -> None:
+        self._flush_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[AI] Tushare 合并查询异常: {task.exception()}")
+
+    async def _flush(self, key: tuple) -> None:
+        """去抖窗口结束：执行该组收集到的调用并分发结果"""
+        group = self._pending.pop(key, [])
+        if not group:
+            return
+        calls = [call for call, _ in group]
         try:
-            v = float(value)
-            if abs(v) >= 10000:
-                return f"{v / 10000:.2f}亿"
-            return f"{v:.0f}万"
-        except (ValueError, TypeError):
-            return str(value)
+            if len(calls) > 1:
+                results = await self._execute_merged_async(calls)
+            else:
+                results = [await super().execute_async(*calls[0])]
+        except Exception as e:
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), text in zip(group, results):
+            if not future.done():
+                future.set_result(text)
+
+
+class AsyncTushareToolExecutor(TushareToolExecutor):
+    """
+    异步 Tushare 工具执行器。
+
+    不经过 tushare 库，直接用共享的 httpx.AsyncClient（Keep-Alive，安装 h2 时启用 HTTP/2）
+    请求 Tushare HTTP 接口，同一轮的多个工具调用在一条连接上并发发出。
+    参数校验、缓存、限速与文本格式化沿用 TushareToolExecutor（格式化在工作线程中执行，
+    网络请求交回事件循环）。execute 保持同步，使用同步 httpx.Client。
+    """
+
+    API_URL = "https://api.tushare.pro"
+
+    def __init__(self, token: str, **kwargs):
+        """
+        初始化异步 Tushare 工具执行器。
+
+        Args:
+            token: Tushare Pro API Token
+            **kwargs: 传给 TushareToolExecutor 的其余参数（cache_dir、rate_limit）
+        """
+        super().__init__(token, **kwargs)
+        # 异步客户端及其所属事件循环（httpx.AsyncClient 不能跨事件循环复用）
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client = None
+        # 同步调用（execute，未处于 execute_async 中）使用的客户端
+        self._sync_client = None
 
     @staticmethod
-    def _fmt(value) -> str:
-        """格式化数值，None 显示为 '-'。"""
-        if value is None:
-            return "-"
+    def _client_options() -> Dict[str, Any]:
+        import httpx
         try:
-            return f"{float(value):.2f}"
-        except (ValueError, TypeError):
-            return str(value)
+            import h2  # noqa: F401
+            http2 = True
+        except ImportError:
+            http2 = False
+        return {
+            "http2": http2,
+            "limits": httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            "timeout": 30,
+        }
+
+    async def _bind_loop(self):
+        """绑定当前事件循环并按需创建 httpx.AsyncClient；换到新的事件循环时关闭旧客户端"""
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._loop is loop:
+            return self._client
+        import httpx
+
+        old_client, old_loop = self._client, self._loop
+        self._client = httpx.AsyncClient(**self._client_options())
+        self._loop = loop
+        if old_client is not None:
+            await self._close_async_client(old_client, old_loop)
+        return self._client
 
     @staticmethod
-    def _fmt_mv(value) -> str:
-        """格式化市值（万元 → 亿元），None 显示为 '-'。"""
-        if value is None:
-            return "-"
+    async def _close_async_client(client, loop) -> None:
+        """关闭异步客户端：其事件循环仍在运行时交回该循环关闭，否则在当前循环中关闭"""
+        try:
+            if loop is not None and loop is not asyncio.get_running_loop() and loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            else:
+                await client.aclose()
+        except Exception:
+            # 旧事件循环已关闭时连接随之失效，关闭失败可忽略
+            pass
+
+    async def execute_async(self, function_name: str, arguments: Dict[str, Any]) -> str:
+        """
+        异步执行工具调用：HTTP 请求在当前事件循环的共享客户端上发出，格式化在工作线程中执行。
+
+        Args:
+            function_name: 工具函数名
+            arguments: 函数参数字典，也可直接传入模型返回的原始 JSON 字符串
+
+        Returns:
+            str: 格式化的文本结果
+        """
+        await self._bind_loop()
+        return await super().execute_async(function_name, arguments)
+
+    def execute_many(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """同步批量入口：在临时事件循环中并发执行，结束前关闭该循环上的客户端"""
+        return asyncio.run(self._execute_many_and_close(calls))
+
+    async def _execute_many_and_close(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
         try:
-            v = float(value)
-            if v >= 10000:
-                return f"{v / 10000:.2f} 亿元"
-            return f"{v:.2f} 万元"
-        except (ValueError, TypeError):
-            return str(value)
+            return await self._execute_coalesced(calls)
+        finally:
+            await self.aclose()
+
+    async def _execute_coalesced(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        await self._bind_loop()
+        return await super()._execute_coalesced(calls)
+
+    def _request(self, api_name: str, params: Dict[str, Any]):
+        """
+        发起单次请求：在 execute_async 的工作线程中提交到事件循环上的异步客户端，
+        其余情况（同步 execute）使用同步客户端。
+        """
+        loop = self._loop
+        if loop is not None and not loop.is_closed() and loop.is_running():
+            try:
+                in_loop_thread = asyncio.get_running_loop() is loop
+            except RuntimeError:
+                in_loop_thread = False
+            if not in_loop_thread:
+                return asyncio.run_coroutine_threadsafe(self._post(api_name, params), loop).result()
+        return self._post_sync(api_name, params)
+
+    def _payload(self, api_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        params = dict(params)
+        fields = params.pop("fields", "")
+        return {"api_name": api_name, "token": self.token, "params": params, "fields": fields}
+
+    @staticmethod
+    def _parse_response(response):
+        """解析 Tushare HTTP 响应为 DataFrame，接口返回错误时抛出异常"""
+        import pandas as pd
+
+        response.raise_for_status()
+        body = _json_loads(response.content)
+        if body.get("code") != 0:
+            raise Exception(body.get("msg") or f"Tushare 返回错误码 {body.get('code')}")
+        data = body.get("data") or {}
+        return pd.DataFrame(data.get("items") or [], columns=data.get("fields") or None)
+
+    async def _post(self, api_name: str, params: Dict[str, Any]):
+        """
+        通过异步客户端直接请求 Tushare HTTP 接口
+
+        Args:
+            api_name: 接口名（如 daily）
+            params: 接口参数（fields 单独提交）
+
+        Returns:
+            接口返回数据构造的 DataFrame
+        """
+        response = await self._client.post(self.API_URL, json=self._payload(api_name, params))
+        return self._parse_response(response)
+
+    def _post_sync(self, api_name: str, params: Dict[str, Any]):
+        """通过同步客户端请求 Tushare HTTP 接口"""
+        if self._sync_client is None:
+            import httpx
+            self._sync_client = httpx.Client(**self._client_options())
+        response = self._sync_client.post(self.API_URL, json=self._payload(api_name, params))
+        return self._parse_response(response)
+
+    async def aclose(self) -> None:
+        """关闭异步与同步 HTTP 客户端"""
+        if self._client is not None:
+            client, loop = self._client, self._loop
+            self._client = None
+            self._loop = None
+            await self._close_async_client(client, loop)
+        self.close()
+
+    def close(self) -> None:
+        """关闭同步 HTTP 客户端（异步客户端需在事件循环中通过 aclose 关闭）"""
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
 
     def validate(self) -> tuple:
         """
-        验证 Tushare 配置是否有效。
+        验证配置是否有效（直接请求 HTTP 接口，不依赖 tushare 库）。
 
         Returns:
             tuple: (是否有效, 错误信息)
         """
+        if self.response_format not in ("text", "json"):
+            return False, f"不支持的工具结果格式: {self.response_format}（可选 text / json）"
         if not self.token:
             return False, "未配置 Tushare Token，请在 config.yaml 或环境变量 TUSHARE_TOKEN 中设置"
         try:
-            import tushare
+            import httpx  # noqa: F401
         except ImportError:
-            return False, "tushare 未安装，请先安装：pip install tushare"
+            return False, "httpx 未安装，请先安装：pip install httpx"
         return True, ""
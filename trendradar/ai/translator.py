@@ -293,3 +293,7 @@ class AITranslator:
         messages.append({"role": "user", "content": user_prompt})
 
         return self.client.chat(messages)
+
+    def close(self) -> None:
+        """释放 AI 客户端持有的连接池等资源"""
+        self.client.close()
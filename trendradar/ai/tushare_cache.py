@@ -0,0 +1,95 @@
+# coding=utf-8
+"""
+Tushare 查询结果磁盘缓存模块
+
+将工具调用的格式化结果按 (工具名, 参数) 持久化为 JSON 文件，进程重启后仍可复用。
+已收盘交易日的数据不再变化，可以长期缓存；当日数据只做短期缓存。
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class TushareDiskCache:
+    """基于 JSON 文件的查询结果缓存，每个键一个文件：{cache_dir}/{key}.json"""
+
+    def __init__(self, cache_dir: str):
+        """
+        初始化磁盘缓存
+
+        Args:
+            cache_dir: 缓存目录（不存在时在首次写入时创建）
+        """
+        self.cache_dir = Path(cache_dir)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        读取未过期的缓存结果
+
+        Args:
+            key: 缓存键（十六进制哈希）
+
+        Returns:
+            缓存的结果文本；不存在、已过期或文件损坏时返回 None
+        """
+        path = self._path(key)
+        try:
+            raw = path.read_bytes()
+            entry = orjson.loads(raw) if orjson is not None else json.loads(raw)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict):
+            # 内容不是缓存条目（文件损坏或被其他程序写入），按未命中处理
+            return None
+
+        try:
+            expired = time.time() - entry.get("ts", 0) > entry.get("ttl", 0)
+        except TypeError:
+            return None
+        if expired:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+        value = entry.get("value")
+        return value if isinstance(value, str) else None
+
+    def put(self, key: str, value: str, ttl: int) -> None:
+        """
+        写入缓存（先写临时文件再替换，避免并发读到半个文件）；写入失败时忽略
+
+        Args:
+            key: 缓存键（十六进制哈希）
+            value: 结果文本
+            ttl: 有效期（秒）
+        """
+        path = self._path(key)
+        tmp_path = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            entry = {"ts": time.time(), "ttl": ttl, "value": value}
+            if orjson is not None:
+                payload = orjson.dumps(entry)
+            else:
+                payload = json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            tmp_path.write_bytes(payload)
+            os.replace(tmp_path, path)
+        except OSError:
+            # 写入或替换失败时清理临时文件，避免残留 .tmp 文件
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
@@ -279,6 +279,20 @@ def _load_ai_config(config_data: Dict) -> Dict:
         "NUM_RETRIES": ai_config.get("num_retries", 2),
         "FALLBACK_MODELS": ai_config.get("fallback_models", []),
         "EXTRA_PARAMS": ai_config.get("extra_params", {}),
+
+        # 客户端选项
+        "TOOL_CONCURRENCY": ai_config.get("tool_concurrency", 8),
+        "TOOL_HISTORY_WINDOW": ai_config.get("tool_history_window", 12),
+        "MAX_TOOL_RESULT_CHARS": ai_config.get("max_tool_result_chars", 8000),
+        "MAX_BUDGET_TOKENS": ai_config.get("max_budget_tokens", 0),
+        "ROUTER_MODEL": ai_config.get("router_model", ""),
+        "CACHE_SIZE": ai_config.get("cache_size", 256),
+        "CACHE_TTL": ai_config.get("cache_ttl", 0),
+        "FORCE_CACHE": ai_config.get("force_cache", False),
+        "SEMANTIC_CACHE": ai_config.get("semantic_cache", False),
+        "SEMANTIC_CACHE_MODEL": ai_config.get("semantic_cache_model", "mixedbread-ai/mxbai-embed-large-v1"),
+        "SEM_THRESHOLD": ai_config.get("semantic_cache_threshold", 0.92),
+        "ENABLE_PROMPT_CACHE": ai_config.get("enable_prompt_cache", True),
     }
 
 
@@ -325,6 +339,10 @@ def _load_tushare_config(config_data: Dict) -> Dict:
     ts_config = config_data.get("tushare", {})
     return {
         "TOKEN": _get_env_str("TUSHARE_TOKEN") or ts_config.get("token", ""),
+        "DATA_CACHE_DIR": ts_config.get("data_cache_dir", ""),
+        "RATE_LIMIT": ts_config.get("rate_limit", 120),
+        "RESPONSE_FORMAT": ts_config.get("response_format", "text"),
+        "PREFETCH_INDEXES": ts_config.get("prefetch_indexes", []),
     }
 
 
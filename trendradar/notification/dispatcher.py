@@ -73,6 +73,11 @@ class NotificationDispatcher:
         self.max_accounts = config.get("MAX_ACCOUNTS_PER_CHANNEL", 3)
         self.translator = translator
 
+    def close(self) -> None:
+        """释放翻译器持有的资源"""
+        if self.translator:
+            self.translator.close()
+
     def _translate_content(
         self,
         report_data: Dict,